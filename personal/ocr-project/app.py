@@ -1,26 +1,153 @@
+import os
 import pytesseract
-from pdf2image import convert_from_path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
 import re
 import requests
 import time
 
 # Path to the poppler bin directory
-poppler_path = r'C:\poppler\Library\bin'
+poppler_path = os.environ.get('POPPLER_PATH', r'C:\poppler\Library\bin')
 
 # Set the path to the Tesseract executable
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+pytesseract.pytesseract.tesseract_cmd = os.environ.get('TESSERACT_CMD', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
+
+# Pages rasterized at once by a worker; only a few chunks are in memory at any time
+pages_per_chunk = int(os.environ.get('OCR_CHUNK_PAGES', 4))
+# OCR worker processes, one per core
+ocr_workers = int(os.environ.get('OCR_WORKERS', os.cpu_count() or 1))
+
+# Each worker runs one Tesseract at a time; its own threads would only fight the other workers
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# tesserocr keeps one Tesseract loaded per worker and hands it pages in memory;
+# pytesseract writes each page to a temp file and starts a tesseract process for it
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+ocr_backend = os.environ.get('OCR_BACKEND', 'tesserocr' if tesserocr is not None else 'pytesseract')
+# tessdata folder for tesserocr; empty uses the one it was built with
+tessdata_path = os.environ.get('OCR_TESSDATA', '')
+ocr_language = os.environ.get('OCR_LANG', 'eng')
+# Rasterization resolution. 200 dpi (pdf2image's default) reads 11 pt body text as
+# well as 300 and is about a fifth faster; raise it for small print or poor scans.
+ocr_dpi = int(os.environ.get('OCR_DPI', 200))
+# Page segmentation mode: 3 is Tesseract's full-page layout analysis, 11 (sparse text)
+# looks for words anywhere. On bench_ocr.py's pages 11 was no faster and missed more words.
+ocr_psm = int(os.environ.get('OCR_PSM', 3))
+# Optional clean-up before OCR, for scans rather than born-digital PDFs
+ocr_binarize = os.environ.get('OCR_BINARIZE', '0') == '1'
+ocr_deskew = os.environ.get('OCR_DESKEW', '0') == '1'
+# Largest skew deskew looks for, in degrees
+max_skew = 5.0
+
+# One Tesseract API per worker process, created on its first page
+_tesseract_api = None
+
+def get_tesseract_api():
+    global _tesseract_api
+    if _tesseract_api is None:
+        options = {'path': tessdata_path} if tessdata_path else {}
+        # tesserocr's PSM is a namespace of ints, not an enum to construct
+        _tesseract_api = tesserocr.PyTessBaseAPI(lang=ocr_language, psm=ocr_psm, **options)
+    return _tesseract_api
+
+# Otsu's threshold from the grayscale histogram
+def otsu_threshold(img):
+    histogram = img.histogram()[:256]
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background = background_sum = 0
+    best_threshold, best_variance = 127, 0.0
+    for threshold, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        background_sum += threshold * count
+        mean_background = background_sum / background
+        mean_foreground = (weighted_total - background_sum) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = threshold, variance
+    return best_threshold
+
+def binarize(img):
+    threshold = otsu_threshold(img)
+    return img.point(lambda p: 255 if p > threshold else 0)
+
+# How sharply the rows of a thumbnail separate into lines and gaps at this rotation
+def row_contrast(inverted, angle):
+    rotated = inverted.rotate(angle, resample=Image.BILINEAR)
+    rows = rotated.resize((1, rotated.height), Image.BOX).tobytes()
+    mean = sum(rows) / len(rows)
+    return sum((row - mean) ** 2 for row in rows)
+
+# Text lines are sharpest when the page is level: try rotations of a thumbnail in
+# whole degrees, then in quarter degrees around the best one
+def estimate_skew(img):
+    thumbnail = img.copy()
+    thumbnail.thumbnail((800, 800))
+    # Ink as white on black so rotation fills the corners with "no ink"
+    inverted = thumbnail.point(lambda p: 255 - p)
+    coarse = int(max_skew)
+    best_angle = max(range(-coarse, coarse + 1), key=lambda angle: row_contrast(inverted, angle))
+    fine = [best_angle + step / 4 for step in (-3, -2, -1, 0, 1, 2, 3)]
+    return max(fine, key=lambda angle: row_contrast(inverted, angle))
+
+def preprocess(img):
+    if img.mode != 'L':
+        img = img.convert('L')
+    if ocr_deskew:
+        angle = estimate_skew(img)
+        if angle:
+            img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if ocr_binarize:
+        img = binarize(img)
+    return img
+
+def recognize_page(img):
+    if ocr_backend == 'tesserocr':
+        api = get_tesseract_api()
+        api.SetImage(img)
+        # Without it Tesseract guesses the resolution from the image and can misjudge
+        # the text size badly enough to find no text on the page
+        api.SetSourceResolution(ocr_dpi)
+        return api.GetUTF8Text()
+    return pytesseract.image_to_string(img, lang=ocr_language, config=f'--psm {ocr_psm}')
+
+# Rasterize and OCR pages first..last (1-based, inclusive) in a worker process
+def ocr_page_range(pdf_path, first_page, last_page):
+    images = convert_from_path(pdf_path, dpi=ocr_dpi, grayscale=True, first_page=first_page,
+                               last_page=last_page, poppler_path=poppler_path)
+    return [recognize_page(preprocess(img)) for img in images]
+
+# Yield the text of each page in page order while later pages are still being OCRed
+def iter_page_texts(pdf_path, workers=ocr_workers, chunk=pages_per_chunk):
+    page_count = pdfinfo_from_path(pdf_path, poppler_path=poppler_path)['Pages']
+    ranges = iter([(first, min(first + chunk - 1, page_count)) for first in range(1, page_count + 1, chunk)])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Two chunks per worker in flight keeps every core busy without piling up images
+        pending = deque()
+        for first, last in ranges:
+            pending.append(pool.submit(ocr_page_range, pdf_path, first, last))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            texts = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(pool.submit(ocr_page_range, pdf_path, *next_range))
+            yield from texts
 
 # Function to extract text using OCR
 def extract_text_with_ocr(pdf_path):
-    # Convert PDF pages to images
-    images = convert_from_path(pdf_path, poppler_path=poppler_path)
-    
-    # Use OCR to extract text from images
-    text = ""
-    for img in images:
-        text += pytesseract.image_to_string(img)
-    
-    return text
+    return "".join(iter_page_texts(pdf_path))
 
 # Function to get unique words from text
 def get_unique_words(text):
@@ -44,49 +171,53 @@ def remove_words_with_continuous_letters(words):
 
     return [word for word in words if not has_continuous_letters(word)]
 
-# Path to your PDF file
-pdf_file_path = 'Class-3-Sci.pdf'
+def main():
+    # Path to your PDF file
+    pdf_file_path = 'Class-3-Sci.pdf'
 
-print("Ocr text extraction started")
-# Extract text from the PDF using OCR
-ocr_text = extract_text_with_ocr(pdf_file_path)
+    print("Ocr text extraction started")
+    # Extract text from the PDF using OCR
+    ocr_text = extract_text_with_ocr(pdf_file_path)
 
-print("Ocr text extraction finished")
+    print("Ocr text extraction finished")
 
-print("unique word extraction started")
+    print("unique word extraction started")
 
-# Extract unique words from the extracted text
-unique_words = get_unique_words(ocr_text)
+    # Extract unique words from the extracted text
+    unique_words = get_unique_words(ocr_text)
 
-print("unique word extraction finished")
+    print("unique word extraction finished")
 
-print("numberless word extraction started")
+    print("numberless word extraction started")
 
-# Remove words containing numbers
-numberless_words = remove_words_with_numbers(unique_words)
+    # Remove words containing numbers
+    numberless_words = remove_words_with_numbers(unique_words)
 
-print("numberless word extraction finished")
-print("filtered word extraction started")
+    print("numberless word extraction finished")
+    print("filtered word extraction started")
 
-filtered_words = remove_words_with_continuous_letters(numberless_words)
+    filtered_words = remove_words_with_continuous_letters(numberless_words)
 
-print("filtered word extraction finished")
-delay_ms = 680  # Delay in milliseconds
-print("valid word extraction started")
+    print("filtered word extraction finished")
+    delay_ms = 680  # Delay in milliseconds
+    print("valid word extraction started")
 
-valid_words = []
-for word in filtered_words:
-    if is_valid_word(word):
-        valid_words.append(word)
-    time.sleep(delay_ms / 1000) 
+    valid_words = []
+    for word in filtered_words:
+        if is_valid_word(word):
+            valid_words.append(word)
+        time.sleep(delay_ms / 1000) 
 
-print("valid word extraction finished")
-# valid_words = [word for word in filtered_words if is_valid_word(word)]
+    print("valid word extraction finished")
+    # valid_words = [word for word in filtered_words if is_valid_word(word)]
 
-# Print the number of valid words and the first 20 valid words as a preview
-print(f"Number of ocr_text: {len(ocr_text)}")
-print(f"Number of unique_words: {len(unique_words)}")
-print(f"Number of numberless_words: {len(numberless_words)}")
-print(f"Number of filtered_words: {len(filtered_words)}")
-print(f"Number of valid words: {len(valid_words)}")
-print(f" valid words: {valid_words[:]}")
+    # Print the number of valid words and the first 20 valid words as a preview
+    print(f"Number of ocr_text: {len(ocr_text)}")
+    print(f"Number of unique_words: {len(unique_words)}")
+    print(f"Number of numberless_words: {len(numberless_words)}")
+    print(f"Number of filtered_words: {len(filtered_words)}")
+    print(f"Number of valid words: {len(valid_words)}")
+    print(f" valid words: {valid_words[:]}")
+
+if __name__ == '__main__':
+    main()
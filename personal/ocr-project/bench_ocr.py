@@ -0,0 +1,193 @@
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Resolution the made-up pages are drawn at
+PAGE_DPI = 300
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff')
+
+# Each configuration is the environment app.py reads, on top of its defaults (or
+# --dpi / OCR_* set by the caller). "subprocess" is how pages were read before:
+# a tesseract process per page.
+CONFIGS = {
+    'subprocess': {'OCR_BACKEND': 'pytesseract'},
+    'tesserocr': {'OCR_BACKEND': 'tesserocr'},
+    'tesserocr-clean': {'OCR_BACKEND': 'tesserocr', 'OCR_BINARIZE': '1', 'OCR_DESKEW': '1'},
+    'tesserocr-sparse': {'OCR_BACKEND': 'tesserocr', 'OCR_PSM': '11'},
+}
+
+# The word list from letter_word_list.py, read without running that script
+def load_vocabulary():
+    with open(os.path.join(HERE, 'letter_word_list.py'), encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(target, 'id', None) == 'words' for target in node.targets):
+            return ast.literal_eval(node.value)
+    raise RuntimeError("letter_word_list.py has no words list")
+
+def load_font(size):
+    from PIL import ImageFont
+    for name in ('DejaVuSans.ttf', 'arial.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+# Pages of known words, so accuracy can be measured without hand-made ground truth.
+# With skew each page is turned slightly, the way a scanner feeds paper.
+def make_test_pages(pages, words_per_page, skew, seed=0):
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    vocabulary = load_vocabulary()
+    # 11 pt text on A4
+    font = load_font(PAGE_DPI * 11 // 72)
+    width, height = PAGE_DPI * 827 // 100, PAGE_DPI * 1169 // 100
+    margin, line_height = PAGE_DPI * 2 // 3, PAGE_DPI // 4
+    images, truth = [], []
+    for _ in range(pages):
+        page_words = [rng.choice(vocabulary) for _ in range(words_per_page)]
+        truth.extend(page_words)
+        image = Image.new('L', (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        x, y = margin, margin
+        for word in page_words:
+            word_width = draw.textlength(word + ' ', font=font)
+            if x + word_width > width - margin:
+                x, y = margin, y + line_height
+            draw.text((x, y), word, fill=0, font=font)
+            x += word_width
+        if skew:
+            image = image.rotate(rng.uniform(-skew, skew), resample=Image.BICUBIC, fillcolor=255)
+        images.append(image)
+    return images, ' '.join(truth)
+
+def list_images(directory):
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+def word_counts(text):
+    return Counter(re.findall(r'[a-z]+', text.lower()))
+
+# Share of the true words found, counting each occurrence once; order is ignored
+# because the sparse-text mode reads words in a different order than full layout
+def word_accuracy(text, truth):
+    found, expected = word_counts(text), word_counts(truth)
+    total = sum(expected.values())
+    return sum(min(count, found[word]) for word, count in expected.items()) / total if total else 0.0
+
+# Page images scaled to OCR_DPI, as pdf2image would have rasterized them
+def load_pages(paths, dpi):
+    from PIL import Image
+    pages = []
+    for path in paths:
+        with Image.open(path) as image:
+            source_dpi = image.info.get('dpi', (PAGE_DPI, PAGE_DPI))[0]
+            page = image.convert('L')
+        if round(source_dpi) != dpi:
+            scale = dpi / source_dpi
+            page = page.resize((round(page.width * scale), round(page.height * scale)), Image.LANCZOS)
+        pages.append(page)
+    return pages
+
+# Runs in its own process because app.py reads its settings at import time
+def run_worker(args):
+    sys.path.insert(0, HERE)
+    import app
+    if args.images:
+        # Preprocessing and recognition only, one page after another in this process
+        pages = load_pages(list_images(args.images), app.ocr_dpi)
+        start = time.monotonic()
+        texts = [app.recognize_page(app.preprocess(page)) for page in pages]
+    else:
+        start = time.monotonic()
+        texts = list(app.iter_page_texts(args.pdf, workers=args.workers))
+    seconds = time.monotonic() - start
+    print(json.dumps({'pages': len(texts), 'seconds': seconds, 'text': ''.join(texts)}))
+
+def run_config(name, args):
+    env = dict(os.environ, **CONFIGS[name])
+    if args.dpi:
+        env['OCR_DPI'] = str(args.dpi)
+    source = ['--images', args.images] if args.images else ['--pdf', args.pdf]
+    command = [sys.executable, os.path.abspath(__file__), '--worker', '--workers', str(args.workers)] + source
+    completed = subprocess.run(command, capture_output=True, text=True, env=env)
+    if completed.returncode != 0:
+        print(f"{name}: failed with exit status {completed.returncode}:")
+        for line in completed.stderr.strip().splitlines()[-5:]:
+            print(f"    {line}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR engines and preprocessing on speed and word accuracy")
+    parser.add_argument('--configs', default=','.join(CONFIGS), help=f"comma-separated, from {', '.join(CONFIGS)}")
+    parser.add_argument('--pdf', help="PDF to read; without it or --images, test pages are made from letter_word_list.py")
+    parser.add_argument('--images', help="directory of page images to read instead of a PDF; skips "
+                        "rasterization, so poppler isn't needed, and times OCR alone")
+    parser.add_argument('--no-pdf', action='store_true', help="hand the made-up pages over as images rather than a PDF")
+    parser.add_argument('--truth', help="text file with the true text of the pages, for accuracy")
+    parser.add_argument('--pages', type=int, default=8, help="made-up pages")
+    parser.add_argument('--words-per-page', type=int, default=200, help="words per made-up page")
+    parser.add_argument('--skew', type=float, default=2.0, help="largest rotation of made-up pages, in degrees")
+    parser.add_argument('--dpi', type=int, help="OCR_DPI for every configuration")
+    parser.add_argument('--workers', type=int, default=1, help="OCR worker processes")
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    truth = None
+    if args.truth:
+        with open(args.truth, encoding='utf-8') as f:
+            truth = f.read()
+    if not args.pdf and not args.images:
+        print(f"Making {args.pages} test pages...")
+        images, truth = make_test_pages(args.pages, args.words_per_page, args.skew)
+        directory = tempfile.mkdtemp(prefix='bench_ocr_')
+        if args.no_pdf:
+            args.images = directory
+            for number, image in enumerate(images, 1):
+                image.save(os.path.join(directory, f'page{number:04d}.png'), dpi=(PAGE_DPI, PAGE_DPI))
+        else:
+            args.pdf = os.path.join(directory, 'test.pdf')
+            images[0].save(args.pdf, save_all=True, append_images=images[1:], resolution=PAGE_DPI)
+
+    results = {}
+    failed = []
+    for name in args.configs.split(','):
+        print(f"Running {name}...")
+        result = run_config(name, args)
+        if result is None:
+            failed.append(name)
+            continue
+        result['pages_per_second'] = result['pages'] / result['seconds']
+        result['word_accuracy'] = word_accuracy(result.pop('text'), truth) if truth is not None else None
+        results[name] = result
+
+    print()
+    print(f"{'config':<16} {'pages':>5} {'seconds':>8} {'pages/s':>8} {'accuracy':>8}")
+    for name, result in results.items():
+        accuracy = f"{result['word_accuracy']:>8.1%}" if result['word_accuracy'] is not None else f"{'n/a':>8}"
+        print(f"{name:<16} {result['pages']:>5} {result['seconds']:>8.2f} {result['pages_per_second']:>8.2f} {accuracy}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'settings': {k: v for k, v in vars(args).items() if k != 'worker'}}, f, indent=2)
+    if failed:
+        sys.exit(f"Failed: {', '.join(failed)}")
+
+if __name__ == '__main__':
+    main()
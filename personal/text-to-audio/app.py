@@ -1,110 +1,176 @@
 import os
-import json
-from flask import Flask, request, jsonify, send_file
+import io
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, Request, Response, request, jsonify, send_file
 from flask_cors import CORS
-from vosk import Model, KaldiRecognizer
-from gtts import gTTS
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
-import wave
-from pydub import AudioSegment
+from flask_sock import Sock
+import models
+from generation import GenerationScheduler, stream_response
+from audio_io import SAMPLE_RATE, AudioDecodeError, decode_to_pcm
+from asr_pool import AsrBusy, AsrPool, AsrUnavailable
+from speech_pipeline import speak_sentences, split_sentences
+from streaming import handle_audio_socket
+from tts import MIMETYPE, TTSError, synthesize
+from metrics import StageTimer, render_metrics, request_seconds
+
+# Keep uploaded files in memory; werkzeug would spool large ones to a temp file
+class InMemoryRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
 
 # Initialize Flask app and CORS
 app = Flask(__name__)
+app.request_class = InMemoryRequest
+# Uploads are held in memory, so cap their size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 25)) * 1024 * 1024
 CORS(app)
+sock = Sock(app)
 
-# Initialize the GPT-2 model and tokenizer
-model_name = 'gpt2'
-tokenizer = GPT2Tokenizer.from_pretrained(model_name)
-model = GPT2LMHeadModel.from_pretrained(model_name)
-
-# Initialize the Vosk model
-model_path = os.path.abspath("model")
-vosk_model = Model(model_path)
-
-def generate_response(text):
-    if not text:
-        return "I didn't catch that. Could you please repeat?"
-    inputs = tokenizer(text, return_tensors='pt')
-    attention_mask = inputs['attention_mask']
-    outputs = model.generate(
-        inputs['input_ids'],
-        max_length=100,
-        num_return_sequences=1,
-        pad_token_id=tokenizer.eos_token_id,
-        attention_mask=attention_mask,
-        temperature=0.7,
-        top_p=0.9,
-        do_sample=True
-    )
-    response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return response
+# Models load on first use (see models.py); under gunicorn they are preloaded in
+# the master so all workers share them.
+# Uploads are recognized on a pool of worker processes; the live stream uses the model directly.
+asr_pool = AsrPool()
+
+# Replies for concurrent requests are generated together in small batches
+generation_scheduler = GenerationScheduler()
+
+# Pipelined replies speak each sentence as soon as it is generated instead of
+# waiting for the whole reply; ?pipeline=1 or 0 overrides this per request
+PIPELINE_DEFAULT = os.environ.get('PIPELINE_RESPONSES', '0') == '1'
 
+# Synthesized replies come from the content-addressed TTS cache
 def text_to_speech(text, lang='en'):
-    tts = gTTS(text=text, lang=lang)
-    file_path = os.path.join(os.path.dirname(__file__), "output.mp3")
-    tts.save(file_path)
-    print(f"Saved TTS to {file_path}")
-    return file_path
-
-def convert_to_wav(file_path):
-    audio = AudioSegment.from_file(file_path)
-    wav_path = os.path.splitext(file_path)[0] + ".wav"
-    audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-    audio.export(wav_path, format="wav")
-    return wav_path
+    return synthesize(text, lang)
 
+# Per-stage timings go out in a Server-Timing header and into /metrics; with ?debug=1
+# the reply is JSON with the texts and timings instead of audio
 @app.route('/process_audio', methods=['POST'])
 def process_audio():
-    # Save the audio file from the request
-    audio_file = request.files['audio']
-    file_path = os.path.join(os.path.dirname(__file__), "input.wav")
-    audio_file.save(file_path)
-    
-    # Debugging: Check file properties
-    print(f"Uploaded file saved to {file_path}")
-    print(f"File size: {os.path.getsize(file_path)} bytes")
-
-    # Ensure the file is in WAV format
+    if 'audio' not in request.files:
+        return jsonify({'error': 'No audio file in the request'}), 400
+    timer = StageTimer()
+    debug = request.args.get('debug') == '1'
+    pipelined = request.args.get('pipeline', '1' if PIPELINE_DEFAULT else '0') == '1'
+
+    # Each request works on its own in-memory copy of the upload
+    with timer.stage('upload'):
+        data = request.files['audio'].read()
+    print(f"Uploaded file size: {len(data)} bytes")
+
     try:
-        wf = wave.open(file_path, "rb")
-        print(f"File channels: {wf.getnchannels()}")
-        print(f"File sample width: {wf.getsampwidth()}")
-        print(f"File frame rate: {wf.getframerate()}")
-        print(f"File number of frames: {wf.getnframes()}")
-        wf.close()
-    except wave.Error as e:
-        print(f"Error opening wave file: {e}")
-        return jsonify({'error': 'Invalid WAV file'}), 400
-
-    # Convert the file to WAV format if necessary
-    wav_path = convert_to_wav(file_path)
-
-    # Process the audio file
-    wf = wave.open(wav_path, "rb")
-    rec = KaldiRecognizer(vosk_model, wf.getframerate())
-    recognized_text = ""
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if rec.AcceptWaveform(data):
-            result = rec.Result()
-            recognized_text += json.loads(result)["text"] + " "
-    final_result = rec.FinalResult()
-    recognized_text += json.loads(final_result)["text"]
+        with timer.stage('decode'):
+            pcm = decode_to_pcm(data)
+    except AudioDecodeError as e:
+        print(f"Error decoding audio: {e}")
+        return jsonify({'error': 'Invalid audio file'}), 400
+    audio_seconds = len(pcm) / 2 / SAMPLE_RATE
+    print(f"Decoded {audio_seconds:.2f}s of audio")
 
+    try:
+        future = asr_pool.submit(pcm)
+        recognized_text, queue_wait, decode_time, skipped = future.result()
+    except AsrBusy as e:
+        print(f"Recognition queue full: {e}")
+        return jsonify({'error': 'Server busy, try again shortly'}), 429, {'Retry-After': '1'}
+    # A worker died under this job, or the pool could not be restarted
+    except (AsrUnavailable, BrokenProcessPool) as e:
+        print(f"Recognition failed: {e}")
+        return jsonify({'error': 'Speech recognition unavailable, try again shortly'}), 503, {'Retry-After': '1'}
+    timer.add('queue_wait', queue_wait)
+    timer.add('recognize', decode_time)
+    print(f"Recognition skipped {skipped:.2f}s of silence")
     print(f"Recognized text: {recognized_text}")
 
+    if pipelined:
+        audio_chunks = speak_sentences(split_sentences(stream_response(recognized_text)))
+        try:
+            if debug:
+                # Time to the first chunk, then the rest of the reply
+                with timer.stage('first_audio'):
+                    first_chunk = next(audio_chunks, b'')
+                with timer.stage('rest_audio'):
+                    audio_bytes = len(first_chunk) + sum(len(chunk) for chunk in audio_chunks)
+                return debug_response(timer, 'pipeline', audio_seconds, skipped, recognized_text, None, audio_bytes)
+            with timer.stage('first_audio'):
+                response = stream_audio_response(audio_chunks)
+        except TTSError as e:
+            audio_chunks.close()
+            print(f"Error synthesizing speech: {e}")
+            return jsonify({'error': 'Speech synthesis failed'}), 503
+        return timed_response(response, timer, 'pipeline')
+
     # Generate response using GPT-2
-    response_text = generate_response(recognized_text.strip())
+    with timer.stage('generate'):
+        response_text = generation_scheduler.generate(recognized_text)
 
     print(f"Generated response: {response_text}")
 
-    # Convert response to speech
-    response_audio_path = text_to_speech(response_text)
+    # Convert response to speech and send it back to the frontend; the cache key is
+    # the ETag, and send_file answers Range and If-None-Match requests
+    try:
+        with timer.stage('tts'):
+            audio = text_to_speech(response_text)
+    except TTSError as e:
+        print(f"Error synthesizing speech: {e}")
+        return jsonify({'error': 'Speech synthesis failed'}), 503
+    print(f"Speech from {audio.engine} ({'cached' if audio.hit else 'new'})")
+    if debug:
+        return debug_response(timer, 'full', audio_seconds, skipped, recognized_text, response_text, os.path.getsize(audio.path))
+    response = send_file(audio.path, mimetype=MIMETYPE, conditional=True, etag=audio.key, max_age=86400)
+    return timed_response(response, timer, 'full')
+
+def timed_response(response, timer, mode):
+    total = timer.total()
+    request_seconds.observe(total, mode=mode)
+    print(f"Answered in {total:.2f}s: {timer.as_dict()}")
+    response.headers['Server-Timing'] = timer.server_timing()
+    return response
 
-    # Send the generated audio file back to the frontend
-    return send_file(response_audio_path, mimetype='audio/mpeg')
+def debug_response(timer, mode, audio_seconds, skipped, recognized_text, response_text, audio_bytes):
+    response = jsonify({
+        'recognized_text': recognized_text,
+        'response_text': response_text,
+        'audio_seconds': audio_seconds,
+        'skipped_seconds': skipped,
+        'reply_audio_bytes': audio_bytes,
+        'timings': timer.as_dict(),
+        'total_seconds': round(timer.total(), 4),
+    })
+    return timed_response(response, timer, mode)
+
+# The first chunk is fetched before answering so a failure still returns an error
+# status; closing the body (e.g. the client went away) stops the work behind it
+def stream_audio_response(audio_chunks):
+    first_chunk = next(audio_chunks, b'')
+
+    def body():
+        try:
+            yield first_chunk
+            yield from audio_chunks
+        finally:
+            audio_chunks.close()
+
+    return Response(body(), mimetype=MIMETYPE)
+
+@app.route('/asr_stats', methods=['GET'])
+def asr_stats():
+    return jsonify(asr_pool.stats())
+
+@app.route('/generation_stats', methods=['GET'])
+def generation_stats():
+    return jsonify(generation_scheduler.stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Live recognition: partial and final results while the audio is still arriving
+@sock.route('/stream_audio')
+def stream_audio(ws):
+    handle_audio_socket(ws, models.get_vosk_model())
 
 if __name__ == "__main__":
+    models.preload()
+    asr_pool.start()
+    generation_scheduler.start()
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from models import VOSK_MODEL_PATH, get_vosk_model
+from recognition import SAMPLE_RATE, recognize_pcm
+
+# Worker processes decoding in parallel, one core each
+ASR_WORKERS = int(os.environ.get('ASR_WORKERS', os.cpu_count() or 1))
+# Jobs allowed in the pool at once (running plus waiting); past this callers get AsrBusy
+ASR_QUEUE_SIZE = int(os.environ.get('ASR_QUEUE_SIZE', ASR_WORKERS * 4))
+
+# The model each worker process decodes with. With the fork start method the parent
+# has already loaded it (see models.get_vosk_model) and the workers share its pages
+# read-only; otherwise every worker loads its own copy here.
+_worker_model = None
+
+class AsrBusy(Exception):
+    pass
+
+# The recognition workers died and could not be brought back
+class AsrUnavailable(Exception):
+    pass
+
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = get_vosk_model(model_path)
+
+def _warm_up(_):
+    return os.getpid()
+
+def _recognize(pcm, sample_rate, submitted_at):
+    started_at = time.time()
+    text, skipped = recognize_pcm(_worker_model, pcm, sample_rate)
+    return text, started_at - submitted_at, time.time() - started_at, skipped
+
+class AsrPool:
+    def __init__(self, workers=ASR_WORKERS, queue_size=ASR_QUEUE_SIZE, model_path=VOSK_MODEL_PATH):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.model_path = model_path
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._decode_total = 0.0
+        self._decode_max = 0.0
+        self._audio_seconds = 0.0
+        self._skipped_seconds = 0.0
+
+    # Start every worker now, before the server starts its threads; forking later
+    # from a busy multi-threaded process is not safe. The lock keeps two first
+    # requests from each starting a pool.
+    def start(self):
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            start = time.monotonic()
+            context = multiprocessing.get_context()
+            if context.get_start_method() == 'fork':
+                get_vosk_model(self.model_path)
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.model_path,),
+            )
+            pids = set(executor.map(_warm_up, range(self.workers)))
+            self._executor = executor
+        print(f"Started {len(pids)} recognition workers ({context.get_start_method()}) in {time.monotonic() - start:.2f}s")
+
+    # Queue 16 kHz mono 16-bit PCM for recognition; returns a future of (text,
+    # queue_wait_seconds, decode_seconds, skipped_seconds). Raises AsrBusy when the queue is full.
+    def submit(self, pcm, sample_rate=SAMPLE_RATE):
+        if self._executor is None:
+            self.start()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise AsrBusy(f"{self.queue_size} recognition jobs already queued")
+        with self._lock:
+            self._pending += 1
+        if isinstance(pcm, memoryview):
+            # decode_to_pcm hands back a view of the upload; it has to be copied once
+            # anyway to reach the worker process
+            pcm = pcm.tobytes()
+        try:
+            future = self._submit(pcm, sample_rate)
+        except Exception:
+            self._release()
+            raise
+        audio_seconds = len(pcm) / 2 / sample_rate
+        future.add_done_callback(lambda f: self._finished(f, audio_seconds))
+        return future
+
+    def _submit(self, pcm, sample_rate):
+        executor = self._executor
+        try:
+            return executor.submit(_recognize, pcm, sample_rate, time.time())
+        except BrokenProcessPool:
+            pass
+        # A worker died (out of memory, a crash in Kaldi) and the executor refuses all
+        # work from then on; replace it and try once more
+        try:
+            self._restart(executor)
+            return self._executor.submit(_recognize, pcm, sample_rate, time.time())
+        except Exception as e:
+            raise AsrUnavailable(f"Recognition workers could not be restarted: {e}") from e
+
+    def _restart(self, broken):
+        with self._start_lock:
+            if self._executor is broken:
+                print("A recognition worker died; restarting the pool")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                with self._lock:
+                    self._restarts += 1
+        self.start()
+
+    def recognize(self, pcm, sample_rate=SAMPLE_RATE):
+        return self.submit(pcm, sample_rate).result()[0]
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _finished(self, future, audio_seconds):
+        self._release()
+        with self._lock:
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+                return
+            text, queue_wait, decode, skipped = future.result()
+            self._completed += 1
+            self._queue_wait_total += queue_wait
+            self._queue_wait_max = max(self._queue_wait_max, queue_wait)
+            self._decode_total += decode
+            self._decode_max = max(self._decode_max, decode)
+            self._audio_seconds += audio_seconds
+            self._skipped_seconds += skipped
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'pending': self._pending,
+                'completed': completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'restarts': self._restarts,
+                'queue_wait_avg': self._queue_wait_total / completed if completed else 0.0,
+                'queue_wait_max': self._queue_wait_max,
+                'decode_avg': self._decode_total / completed if completed else 0.0,
+                'decode_max': self._decode_max,
+                # Decode time per second of audio, below 1 is faster than real time
+                'real_time_factor': self._decode_total / self._audio_seconds if self._audio_seconds else 0.0,
+                'audio_seconds': self._audio_seconds,
+                # Silence the VAD kept away from the decoder
+                'skipped_seconds': self._skipped_seconds,
+            }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
@@ -1,41 +1,21 @@
-import os
-import json
-import wave
-from vosk import Model, KaldiRecognizer
-from pydub import AudioSegment
-
-def convert_to_wav(file_path):
-    audio = AudioSegment.from_file(file_path)
-    wav_path = "converted_audio.wav"
-    audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-    audio.export(wav_path, format="wav")
-    return wav_path
+import sys
+from audio_io import SAMPLE_RATE, decode_to_pcm
+from models import get_vosk_model
+from recognition import recognize_pcm
 
 def audio_file_to_text(file_path):
-    # Convert the file to WAV format if necessary
-    wav_path = convert_to_wav(file_path)
-
-    model_path = os.path.abspath("model")
-    model = Model(model_path)
-    rec = KaldiRecognizer(model, 16000)
+    # Decode any format ffmpeg reads to 16 kHz mono PCM in memory, no temp file
+    with open(file_path, 'rb') as f:
+        pcm = decode_to_pcm(f.read())
 
-    # Open the audio file
-    wf = wave.open(wav_path, "rb")
+    # Only the speech segments are decoded; leading, trailing and long pauses are skipped
+    recognized_text, skipped = recognize_pcm(get_vosk_model(), pcm, SAMPLE_RATE)
+    print(f"Skipped {skipped:.2f}s of silence")
 
-    recognized_text = ""
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if rec.AcceptWaveform(data):
-            result = rec.Result()
-            recognized_text += json.loads(result)["text"] + " "
-    final_result = rec.FinalResult()
-    recognized_text += json.loads(final_result)["text"]
-    
     return recognized_text
 
 if __name__ == "__main__":
-    file_path = "uploads/recorded_audio.wav"  # Replace with your audio file path
+    # For whole directories use batch_transcribe.py
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "uploads/recorded_audio.wav"
     text = audio_file_to_text(file_path)
     print("Recognized text:", text)
@@ -0,0 +1,156 @@
+import math
+import struct
+import subprocess
+import numpy as np
+
+try:
+    from scipy.signal import resample_poly
+except ImportError:
+    resample_poly = None
+
+SAMPLE_RATE = 16000
+# Output samples computed at once by the NumPy resampler, bounds its scratch memory
+RESAMPLE_BLOCK = 1 << 15
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class AudioDecodeError(Exception):
+    pass
+
+# Decode uploaded audio to 16 kHz mono 16-bit PCM, all in memory. WAVs (PCM 8/16/24/32-bit
+# or float, plain or extensible) are converted here with NumPy; a WAV that is already
+# 16 kHz mono 16-bit comes back as a memoryview of the upload without a copy. Only
+# compressed formats (the browser's webm/opus, mp3, ...) go through ffmpeg.
+def decode_to_pcm(data, sample_rate=SAMPLE_RATE):
+    wav = parse_wav(data)
+    if wav is None:
+        return ffmpeg_to_pcm(data, sample_rate)
+    return wav_to_pcm(*wav, sample_rate=sample_rate)
+
+# The fmt fields and sample bytes of a RIFF/WAVE buffer, or None if it isn't a WAV
+# this module can read (then ffmpeg gets it)
+def parse_wav(data):
+    view = memoryview(data)
+    if len(view) < 12 or bytes(view[:4]) != b'RIFF' or bytes(view[8:12]) != b'WAVE':
+        return None
+    fmt = None
+    position = 12
+    while position + 8 <= len(view):
+        chunk_id = bytes(view[position:position + 4])
+        size, = struct.unpack_from('<I', view, position + 4)
+        body = position + 8
+        if chunk_id == b'fmt ':
+            # A file cut off inside the fmt chunk is left to ffmpeg, which reports it
+            if size < 16 or body + 16 > len(view):
+                return None
+            format_tag, channels, rate, _, block_align, bits = struct.unpack_from('<HHIIHH', view, body)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                if body + 26 > len(view):
+                    return None
+                # The real format is the first two bytes of the SubFormat GUID
+                format_tag, = struct.unpack_from('<H', view, body + 24)
+            fmt = (format_tag, channels, rate, block_align, bits)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            # Recorders that stream WAVs often leave the data size as 0 or 0xFFFFFFFF
+            end = len(view) if size in (0, 0xFFFFFFFF) else min(len(view), body + size)
+            format_tag, channels, rate, block_align, bits = fmt
+            supported = (format_tag == WAVE_FORMAT_PCM and bits in (8, 16, 24, 32)) or \
+                (format_tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64))
+            if not supported or channels < 1 or rate < 1 or block_align == 0 or block_align != channels * bits // 8:
+                return None
+            usable = (end - body) // block_align * block_align
+            return view[body:body + usable], format_tag, channels, rate, bits
+        position = body + size + (size & 1)
+    return None
+
+def wav_to_pcm(samples, format_tag, channels, rate, bits, sample_rate=SAMPLE_RATE):
+    if format_tag == WAVE_FORMAT_PCM and bits == 16 and channels == 1 and rate == sample_rate:
+        return samples
+    if len(samples) == 0:
+        raise AudioDecodeError("No audio found")
+    audio = to_float(samples, format_tag, bits).reshape(-1, channels)
+    mono = audio[:, 0] if channels == 1 else audio.mean(axis=1)
+    if rate != sample_rate:
+        mono = resample(mono, rate, sample_rate)
+    return to_int16(mono)
+
+# Samples as float32 in [-1, 1)
+def to_float(samples, format_tag, bits):
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return np.frombuffer(samples, dtype='<f4' if bits == 32 else '<f8').astype(np.float32)
+    if bits == 8:
+        # 8-bit WAV is unsigned
+        return (np.frombuffer(samples, dtype=np.uint8).astype(np.float32) - 128) / 128
+    if bits == 16:
+        return np.frombuffer(samples, dtype='<i2').astype(np.float32) / 32768
+    if bits == 24:
+        raw = np.frombuffer(samples, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        # Sign-extend from 24 bits
+        values = (values << 8) >> 8
+        return values.astype(np.float32) / 8388608
+    return (np.frombuffer(samples, dtype='<i4').astype(np.float64) / 2147483648).astype(np.float32)
+
+def to_int16(audio):
+    return np.clip(np.round(audio * 32768), -32768, 32767).astype('<i2').tobytes()
+
+# Kaiser-windowed sinc low-pass for resampling by up/down, the same design as
+# scipy's resample_poly (half-length 10 taps of the slower rate, beta 5)
+def _design_filter(up, down):
+    max_rate = max(up, down)
+    half_length = 10 * max_rate
+    t = np.arange(-half_length, half_length + 1, dtype=np.float64)
+    cutoff = 1.0 / max_rate
+    taps = cutoff * np.sinc(cutoff * t) * np.kaiser(len(t), 5.0)
+    return taps * up, half_length
+
+# Polyphase resampling in NumPy: each output sample is the dot product of one phase of
+# the filter with the input samples under it, computed a block of outputs at a time
+def _resample_numpy(audio, up, down):
+    taps, half_length = _design_filter(up, down)
+    per_phase = math.ceil(len(taps) / up)
+    phases = np.zeros(per_phase * up, dtype=np.float32)
+    phases[:len(taps)] = taps
+    # phases[k, p] is tap p + k * up
+    phases = phases.reshape(per_phase, up)
+
+    out_length = math.ceil(len(audio) * up / down)
+    padded = np.concatenate([np.zeros(per_phase, dtype=np.float32), audio.astype(np.float32),
+                             np.zeros(per_phase + 1, dtype=np.float32)])
+    offsets = np.arange(per_phase)
+    out = np.empty(out_length, dtype=np.float32)
+    for start in range(0, out_length, RESAMPLE_BLOCK):
+        positions = np.arange(start, min(out_length, start + RESAMPLE_BLOCK), dtype=np.int64) * down + half_length
+        phase = positions % up
+        base = positions // up
+        indices = np.clip(base[:, None] - offsets[None, :] + per_phase, 0, len(padded) - 1)
+        out[start:start + len(positions)] = np.einsum('nk,kn->n', padded[indices], phases[:, phase])
+    return out
+
+def resample(audio, rate, target_rate):
+    divisor = math.gcd(rate, target_rate)
+    up, down = target_rate // divisor, rate // divisor
+    if resample_poly is not None:
+        return resample_poly(audio, up, down).astype(np.float32)
+    return _resample_numpy(audio, up, down)
+
+def ffmpeg_to_pcm(data, sample_rate=SAMPLE_RATE):
+    command = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-i', 'pipe:0',
+        '-f', 's16le', '-acodec', 'pcm_s16le', '-ac', '1', '-ar', str(sample_rate),
+        'pipe:1',
+    ]
+    try:
+        result = subprocess.run(command, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(e.stderr.decode(errors='replace').strip() or "ffmpeg could not decode the audio")
+    if not result.stdout:
+        raise AudioDecodeError("No audio found")
+    return result.stdout
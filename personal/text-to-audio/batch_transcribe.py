@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from audio_io import SAMPLE_RATE, decode_to_pcm
+from models import VOSK_MODEL_PATH, get_vosk_model
+from recognition import recognize_pcm
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.oga', '.opus', '.flac', '.m4a', '.webm', '.aac')
+
+# Loaded once per worker process by the pool's initializer
+_model = None
+
+def _init_worker(model_path):
+    global _model
+    _model = get_vosk_model(model_path)
+
+def _ready(_):
+    return os.getpid()
+
+def transcribe_file(path):
+    start = time.monotonic()
+    try:
+        with open(path, 'rb') as f:
+            pcm = decode_to_pcm(f.read())
+        text, skipped = recognize_pcm(_model, pcm, SAMPLE_RATE)
+    # Anything a file can trigger is recorded against it, so one bad file can't
+    # stop the run, and rerunning doesn't hit the same crash again
+    except Exception as e:
+        return {'path': path, 'error': f"{type(e).__name__}: {e}"}
+    return {
+        'path': path,
+        'text': text,
+        'audio_seconds': round(len(pcm) / 2 / SAMPLE_RATE, 3),
+        'skipped_seconds': round(skipped, 3),
+        'decode_seconds': round(time.monotonic() - start, 3),
+    }
+
+# A directory (searched recursively) or a manifest: a text file with one path per
+# line, or JSONL with a "path" field. Relative manifest paths are taken from the
+# manifest's directory. Paths come back absolute, so a run resumed from another
+# directory (or given ./dir instead of dir) recognizes what is already done.
+def list_inputs(source, extensions=AUDIO_EXTENSIONS):
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(os.path.abspath(source)):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(extensions))
+        return sorted(paths)
+
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = json.loads(line)['path'] if line.startswith('{') else line
+            paths.append(os.path.normpath(os.path.join(base, path)))
+    return paths
+
+# Paths already transcribed by an earlier run. Failures are tried again, except files
+# that crashed a worker on their own; delete their line to try one again.
+def load_done(output):
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves a partial last line
+                continue
+            if 'error' not in record or record.get('crashed'):
+                # Older runs recorded directory paths as given on the command line
+                done.add(os.path.abspath(record['path']))
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a directory or manifest of audio files with Vosk")
+    parser.add_argument('source', help="directory of audio files, or a manifest (one path per line, or JSONL with \"path\")")
+    parser.add_argument('--output', default='transcripts.jsonl', help="JSONL results, appended to as files finish")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes, one model each")
+    parser.add_argument('--model', default=VOSK_MODEL_PATH, help="Vosk model directory")
+    args = parser.parse_args()
+
+    paths = list_inputs(args.source)
+    done = load_done(args.output)
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} files, {len(paths) - len(todo)} already done, {len(todo)} to transcribe on {args.workers} workers")
+    if not todo:
+        return
+
+    def new_pool():
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.model,))
+        # A model that can't load breaks the pool here, before any file is blamed for it
+        try:
+            list(pool.map(_ready, range(args.workers)))
+        except BrokenProcessPool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            sys.exit(f"Could not start the workers; check --model ({args.model})")
+        return pool
+
+    start = time.monotonic()
+    finished = failed = 0
+    audio_seconds = decode_seconds = 0.0
+    # Only a few files per worker are in flight, so memory stays flat on huge backfills
+    max_in_flight = args.workers * 2
+    remaining = iter(todo)
+    # Files that were in flight when a worker died (out of memory, a crash in Kaldi).
+    # Any of them may be the cause, so each is retried alone; one that kills its worker
+    # again is recorded as crashed and skipped by later runs.
+    suspects = deque()
+    # Files whose submit found the pool already broken; they go first once it's rebuilt
+    resubmit = deque()
+    pending = {}
+    pool = new_pool()
+
+    def submit(path):
+        try:
+            pending[pool.submit(transcribe_file, path)] = path
+            return True
+        except BrokenProcessPool:
+            resubmit.appendleft(path)
+            return False
+
+    # Whether the pool broke before this file's result could come back
+    def died(future):
+        try:
+            future.result()
+            return False
+        except BrokenProcessPool:
+            return True
+
+    try:
+        with open(args.output, 'a', encoding='utf-8') as out:
+            while True:
+                isolated = None
+                broken = False
+                if suspects:
+                    if not pending:
+                        isolated = suspects.popleft()
+                        broken = not submit(isolated)
+                else:
+                    while len(pending) < max_in_flight:
+                        path = resubmit.popleft() if resubmit else next(remaining, None)
+                        if path is None:
+                            break
+                        if not submit(path):
+                            broken = True
+                            break
+                if not pending and not broken:
+                    break
+
+                completed = wait(pending, return_when=FIRST_COMPLETED)[0] if pending else []
+                for future in completed:
+                    path = pending.pop(future)
+                    if died(future):
+                        broken = True
+                        if path != isolated:
+                            suspects.append(path)
+                            continue
+                        record = {'path': path, 'error': "worker process died on this file", 'crashed': True}
+                    else:
+                        record = future.result()
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    out.flush()
+                    finished += 1
+                    if 'error' in record:
+                        failed += 1
+                        print(f"Failed {record['path']}: {record['error']}")
+                        continue
+                    audio_seconds += record['audio_seconds']
+                    decode_seconds += record['decode_seconds']
+                if broken:
+                    suspects.extend(pending.values())
+                    pending.clear()
+                    print(f"A worker died; restarting the pool ({len(suspects)} files to retry one at a time)")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = new_pool()
+                if completed and (finished % 50 == 0 or not pending):
+                    elapsed = time.monotonic() - start
+                    print(f"{finished}/{len(todo)} files, {finished / elapsed:.2f} files/s")
+    except KeyboardInterrupt:
+        print("Interrupted; run again to continue where this left off")
+        sys.exit(1)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.monotonic() - start
+    print()
+    print(f"files:        {finished - failed} transcribed, {failed} failed")
+    print(f"throughput:   {finished / elapsed:.2f} files/s ({elapsed:.1f} s wall)")
+    if audio_seconds:
+        # Wall-clock RTF is what the backfill costs; per-worker RTF is one core's speed
+        print(f"wall RTF:     {elapsed / audio_seconds:.3f} ({audio_seconds / 3600:.2f} h of audio)")
+        print(f"worker RTF:   {decode_seconds / audio_seconds:.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import json
+import math
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Short spoken-style prompts like the ones the recognizer hands the responder
+DEFAULT_PROMPTS = [
+    "hello how are you today",
+    "tell me about python",
+    "what is the weather like",
+    "can you recommend a good book",
+    "how do i make a cup of tea",
+    "what time is it in london",
+    "tell me a joke",
+    "why is the sky blue",
+]
+
+# Held-out text for perplexity; a lower number means the backend kept more of the model
+REFERENCE_TEXT = (
+    "Python is a high-level, general-purpose programming language. Its design philosophy "
+    "emphasizes code readability with the use of significant indentation. Python is dynamically "
+    "typed and garbage-collected. It supports multiple programming paradigms, including structured, "
+    "object-oriented and functional programming."
+)
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def perplexity(generation, text):
+    import torch
+    inputs = generation.get_tokenizer()(text, return_tensors='pt')
+    with torch.no_grad():
+        logits = generation.get_generation_model()(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask']).logits
+    loss = torch.nn.functional.cross_entropy(logits[0, :-1].float(), inputs['input_ids'][0, 1:])
+    return math.exp(loss.item())
+
+# Runs in its own process so memory and thread settings don't leak between backends
+def run_worker(args):
+    os.environ['GEN_BACKEND'] = args.worker
+    if args.threads:
+        os.environ['GENERATION_THREADS'] = str(args.threads)
+    sys.path.insert(0, HERE)
+
+    import generation
+    load_start = time.monotonic()
+    tokenizer = generation.get_tokenizer()
+    model = generation.get_generation_model()
+    load_seconds = time.monotonic() - load_start
+    rss_after_load = peak_rss_mb()
+
+    latencies = []
+    greedy = []
+    for round_number in range(args.rounds + 1):
+        for prompt in args.prompts:
+            inputs = tokenizer(prompt, return_tensors='pt')
+            start = time.monotonic()
+            output = model.generate(
+                inputs['input_ids'],
+                attention_mask=inputs['attention_mask'],
+                max_new_tokens=args.new_tokens,
+                min_new_tokens=args.new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+                do_sample=False
+            )
+            seconds = time.monotonic() - start
+            # The first round warms caches and isn't timed
+            if round_number == 0:
+                greedy.append(output[0, inputs['input_ids'].shape[1]:].tolist())
+            else:
+                latencies.append(seconds)
+
+    result = {
+        'backend': args.worker,
+        'load_seconds': load_seconds,
+        'latency_p50': statistics.median(latencies),
+        'latency_mean': statistics.mean(latencies),
+        'tokens_per_second': args.new_tokens * len(latencies) / sum(latencies),
+        'rss_after_load_mb': rss_after_load,
+        'peak_rss_mb': peak_rss_mb(),
+        'perplexity': perplexity(generation, REFERENCE_TEXT),
+        'greedy': greedy,
+    }
+    print(json.dumps(result))
+
+def run_backend(backend, args):
+    command = [sys.executable, os.path.abspath(__file__), '--worker', backend,
+               '--rounds', str(args.rounds), '--new-tokens', str(args.new_tokens), '--threads', str(args.threads)]
+    if args.prompts_file:
+        command += ['--prompts-file', args.prompts_file]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        print(f"{backend}: failed: {error[-1] if error else completed.returncode}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+# Share of greedy tokens that match the eager model's, position by position
+def agreement(result, baseline):
+    matched = total = exact = 0
+    for ours, theirs in zip(result['greedy'], baseline['greedy']):
+        total += len(theirs)
+        matched += sum(a == b for a, b in zip(ours, theirs))
+        exact += ours == theirs
+    return matched / total if total else 0.0, exact / len(baseline['greedy'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare GPT-2 generation backends on this CPU")
+    parser.add_argument('--backends', default='eager,int8,onnx', help="comma-separated backends to compare")
+    parser.add_argument('--rounds', type=int, default=3, help="timed passes over the prompts")
+    parser.add_argument('--new-tokens', type=int, default=40, help="tokens generated per prompt")
+    parser.add_argument('--threads', type=int, default=0, help="GENERATION_THREADS for every backend (0 = library default)")
+    parser.add_argument('--prompts-file', help="text file, one prompt per line")
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    args.prompts = DEFAULT_PROMPTS
+    if args.prompts_file:
+        with open(args.prompts_file, encoding='utf-8') as f:
+            args.prompts = [line.strip() for line in f if line.strip()]
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = {}
+    for backend in args.backends.split(','):
+        print(f"Running {backend}...")
+        result = run_backend(backend, args)
+        if result is not None:
+            results[backend] = result
+
+    baseline = results.get('eager')
+    print()
+    print(f"{'backend':<8} {'load s':>7} {'p50 s':>7} {'tok/s':>7} {'RSS MB':>7} {'ppl':>7} {'agree':>7} {'exact':>7}")
+    for backend, result in results.items():
+        if baseline is not None:
+            result['token_agreement'], result['exact_match'] = agreement(result, baseline)
+            agree = f"{result['token_agreement']:>7.1%} {result['exact_match']:>7.1%}"
+        else:
+            agree = f"{'n/a':>7} {'n/a':>7}"
+        print(f"{backend:<8} {result['load_seconds']:>7.2f} {result['latency_p50']:>7.2f} "
+              f"{result['tokens_per_second']:>7.1f} {result['peak_rss_mb']:>7.0f} {result['perplexity']:>7.2f} {agree}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'settings': {k: v for k, v in vars(args).items() if k != 'worker'}}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
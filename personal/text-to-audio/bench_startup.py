@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+def process_tree(pid):
+    pids = [pid]
+    for child in children(pid):
+        pids.extend(process_tree(child))
+    return pids
+
+# Proportional and resident set size in MB from /proc (Linux). PSS splits shared
+# pages between the processes sharing them, so the sum over a tree is real usage;
+# summed RSS counts copy-on-write weights once per worker.
+def memory_mb(pid):
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Pss', 'Rss'):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values.get('Pss', 0.0), values.get('Rss', 0.0)
+
+def run_server(workers, preload, timeout):
+    env = dict(os.environ, WEB_WORKERS=str(workers), PRELOAD_MODELS='1' if preload else '0',
+               BIND=f'127.0.0.1:{free_port()}')
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+    start = time.monotonic()
+    server = subprocess.Popen(command, cwd=HERE, env=env, stderr=subprocess.PIPE, text=True)
+    ready = threading.Event()
+    ready_workers = []
+    log = []
+
+    def read_log():
+        for line in server.stderr:
+            log.append(line)
+            if 'Worker' in line and 'ready' in line:
+                ready_workers.append(line)
+                if len(ready_workers) >= workers:
+                    ready.set()
+
+    threading.Thread(target=read_log, daemon=True).start()
+    try:
+        if not ready.wait(timeout):
+            raise RuntimeError(f"{workers} workers not ready after {timeout}s:\n{''.join(log[-10:])}")
+        startup = time.monotonic() - start
+        # Let the workers settle before measuring
+        time.sleep(1)
+        pids = process_tree(server.pid)
+        pss = rss = 0.0
+        for pid in pids:
+            process_pss, process_rss = memory_mb(pid)
+            pss += process_pss
+            rss += process_rss
+        return {'workers': workers, 'preload': preload, 'startup_seconds': startup,
+                'processes': len(pids), 'total_pss_mb': pss, 'total_rss_mb': rss}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure gunicorn startup time and memory with and without preloaded models")
+    parser.add_argument('--workers', default='1,4,8', help="comma-separated worker counts")
+    parser.add_argument('--modes', default='preload,per-worker', help="preload, per-worker, or both")
+    parser.add_argument('--timeout', type=int, default=600, help="seconds to wait for the workers")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(','):
+        for workers in (int(count) for count in args.workers.split(',')):
+            print(f"Starting {workers} workers ({mode})...")
+            results.append(run_server(workers, mode == 'preload', args.timeout))
+
+    print()
+    print(f"{'mode':<11} {'workers':>7} {'startup s':>9} {'PSS MB':>8} {'RSS MB':>8}")
+    for result in results:
+        mode = 'preload' if result['preload'] else 'per-worker'
+        print(f"{mode:<11} {result['workers']:>7} {result['startup_seconds']:>9.2f} "
+              f"{result['total_pss_mb']:>8.0f} {result['total_rss_mb']:>8.0f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
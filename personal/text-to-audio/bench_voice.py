@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# A silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz): 1152 samples, about 26 ms
+SILENT_MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0x64]) + bytes(413)
+FRAME_SECONDS = 1152 / 44100
+
+# Stands in for gTTS so the benchmark needs no network: waits like a remote call
+# would, then returns silence about as long as the text would take to say
+class StandinTTSEngine:
+    name = 'standin'
+
+    def __init__(self, latency, seconds_per_char=0.06):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+
+    def synthesize(self, text, lang, voice):
+        time.sleep(self.latency)
+        frames = max(1, int(len(text) * self.seconds_per_char / FRAME_SECONDS))
+        return SILENT_MP3_FRAME * frames
+
+def list_clips(paths):
+    clips = []
+    for path in paths:
+        if os.path.isdir(path):
+            clips.extend(os.path.join(path, name) for name in sorted(os.listdir(path)))
+        elif os.path.exists(path):
+            clips.append(path)
+    return [clip for clip in clips if os.path.isfile(clip)]
+
+def multipart_body(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode('utf-8') + data + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+def parse_server_timing(header):
+    timings = {}
+    for entry in (header or '').split(','):
+        name, _, params = entry.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur':
+                timings[name] = float(value) / 1000
+    return timings
+
+def post_clip(base_url, query, clip):
+    path, data, audio_seconds = clip
+    body, content_type = multipart_body('audio', os.path.basename(path), data)
+    request = urllib.request.Request(f"{base_url}/process_audio{query}", data=body, headers={'Content-Type': content_type})
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            first_byte = time.monotonic() - start
+            timings = parse_server_timing(response.headers.get('Server-Timing'))
+            response.read()
+    except urllib.error.HTTPError as e:
+        return {'clip': path, 'status': e.code}
+    total = time.monotonic() - start
+    return {'clip': path, 'status': 200, 'first_byte': first_byte, 'total': total,
+            'audio_seconds': audio_seconds, 'timings': timings}
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+# Peak resident memory of this process plus its children (the recognition workers)
+class MemorySampler:
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+
+    def sample(self):
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    def run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb or 0, self.sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded clips against /process_audio and report per-stage latency")
+    parser.add_argument('clips', nargs='*', default=[os.path.join(HERE, 'uploads'), os.path.join(HERE, 'converted_audio.wav')],
+                        help="audio files or directories to replay")
+    parser.add_argument('--requests', type=int, default=16, help="requests to send, cycling through the clips")
+    parser.add_argument('--concurrency', type=int, default=4, help="requests in flight at once")
+    parser.add_argument('--pipeline', action='store_true', help="use the sentence-pipelined reply mode")
+    parser.add_argument('--tts-latency', type=int, default=150, help="ms the stand-in TTS takes per call")
+    parser.add_argument('--max-length', type=int, help="GEN_MAX_LENGTH for the responder")
+    parser.add_argument('--asr-workers', type=int, help="ASR_WORKERS for the recognition pool")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    # The app reads these at import time
+    os.environ['TTS_ENGINES'] = 'standin'
+    # A fresh cache, so only replies repeated within this run are hits
+    os.environ['TTS_CACHE_DIR'] = tempfile.mkdtemp(prefix='bench_tts_')
+    if args.max_length:
+        os.environ['GEN_MAX_LENGTH'] = str(args.max_length)
+    if args.asr_workers:
+        os.environ['ASR_WORKERS'] = str(args.asr_workers)
+    sys.path.insert(0, HERE)
+    os.chdir(HERE)
+    import tts
+    tts.ENGINES['standin'] = StandinTTSEngine(args.tts_latency / 1000)
+    from audio_io import SAMPLE_RATE, AudioDecodeError, decode_to_pcm
+
+    clips = []
+    for path in list_clips(args.clips):
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            audio_seconds = len(decode_to_pcm(data)) / 2 / SAMPLE_RATE
+        except AudioDecodeError as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        clips.append((path, data, audio_seconds))
+    if not clips:
+        print("No playable clips")
+        return
+
+    with MemorySampler() as memory:
+        print("Loading models...")
+        boot_start = time.monotonic()
+        import app as voice_app
+        from werkzeug.serving import make_server
+        voice_app.asr_pool.start()
+        voice_app.generation_scheduler.start()
+        boot_seconds = time.monotonic() - boot_start
+
+        server = make_server('127.0.0.1', 0, voice_app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        query = '?pipeline=1' if args.pipeline else '?pipeline=0'
+        send = partial(post_clip, base_url, query)
+
+        # One untimed request loads lazily-initialized pieces (first generate, first TTS)
+        send(clips[0])
+
+        plan = [clips[i % len(clips)] for i in range(args.requests)]
+        print(f"Replaying {len(plan)} requests over {len(clips)} clips, {args.concurrency} at a time...")
+        run_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(send, plan))
+        wall = time.monotonic() - run_start
+
+    ok = [result for result in results if result['status'] == 200]
+    errors = len(results) - len(ok)
+    stages = {}
+    for result in ok:
+        for stage, seconds in result['timings'].items():
+            stages.setdefault(stage, []).append(seconds)
+    summary = {
+        'boot_seconds': boot_seconds,
+        'wall_seconds': wall,
+        'requests': len(results),
+        'errors': errors,
+        'requests_per_second': len(ok) / wall,
+        'stages': {stage: {'p50': statistics.median(values), 'p95': percentile(values, 0.95)} for stage, values in stages.items()},
+        'settings': vars(args),
+    }
+    if ok:
+        totals = [result['total'] for result in ok]
+        first_bytes = [result['first_byte'] for result in ok]
+        rtfs = [result['total'] / result['audio_seconds'] for result in ok if result['audio_seconds']]
+        summary.update({
+            'total_p50': statistics.median(totals), 'total_p95': percentile(totals, 0.95),
+            'first_byte_p50': statistics.median(first_bytes), 'first_byte_p95': percentile(first_bytes, 0.95),
+            'rtf_p50': statistics.median(rtfs) if rtfs else None,
+        })
+    summary['peak_rss_mb'] = memory.peak_mb if memory.peak_mb is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print()
+    print(f"boot:        {boot_seconds:.2f} s")
+    print(f"throughput:  {summary['requests_per_second']:.2f} requests/s ({len(ok)} ok, {errors} failed in {wall:.2f} s)")
+    if ok:
+        print(f"first byte:  p50 {summary['first_byte_p50']:.3f} s, p95 {summary['first_byte_p95']:.3f} s")
+        print(f"total:       p50 {summary['total_p50']:.3f} s, p95 {summary['total_p95']:.3f} s")
+        if summary['rtf_p50'] is not None:
+            print(f"RTF:         p50 {summary['rtf_p50']:.3f} (request time per second of input audio)")
+    for stage, values in summary['stages'].items():
+        print(f"  {stage:<12} p50 {values['p50']:.3f} s, p95 {values['p95']:.3f} s")
+    print(f"peak RSS:    {summary['peak_rss_mb']:.0f} MB")
+    if memory.peak_mb is None:
+        print("             (this process only; install psutil to include the recognition workers)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    server.shutdown()
+    voice_app.asr_pool.close()
+
+if __name__ == '__main__':
+    main()
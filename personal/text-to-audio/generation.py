@@ -0,0 +1,184 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from models import BACKEND, get_generation_model, get_tokenizer
+
+# Length of prompt plus reply, in tokens, as generate(max_length=100) had it
+MAX_LENGTH = int(os.environ.get('GEN_MAX_LENGTH', 100))
+# Most prompts run in one generate call
+MAX_BATCH = int(os.environ.get('GEN_MAX_BATCH', 8))
+# How long the first prompt of a batch waits for others to join it
+MAX_WAIT = float(os.environ.get('GEN_MAX_WAIT_MS', 20)) / 1000
+
+NO_INPUT_REPLY = "I didn't catch that. Could you please repeat?"
+
+# Generate a reply for each prompt with one batched generate call. Each reply is
+# decoded like the single-prompt version: the prompt followed by what was generated,
+# with at most MAX_LENGTH tokens in total for that prompt.
+def generate_batch(texts):
+    replies = [None] * len(texts)
+    prompts = []
+    for i, text in enumerate(texts):
+        if text:
+            prompts.append((i, text))
+        else:
+            replies[i] = NO_INPUT_REPLY
+    if not prompts:
+        return replies, 0
+
+    tokenizer = get_tokenizer()
+    inputs = tokenizer([text for _, text in prompts], return_tensors='pt', padding=True)
+    lengths = inputs['attention_mask'].sum(dim=1).tolist()
+    budgets = [max(1, MAX_LENGTH - length) for length in lengths]
+    outputs = get_generation_model().generate(
+        inputs['input_ids'],
+        attention_mask=inputs['attention_mask'],
+        max_new_tokens=max(budgets),
+        num_return_sequences=1,
+        pad_token_id=tokenizer.eos_token_id,
+        temperature=0.7,
+        top_p=0.9,
+        do_sample=True
+    )
+
+    padded_length = inputs['input_ids'].shape[1]
+    new_tokens = 0
+    for (i, _), length, budget, output in zip(prompts, lengths, budgets, outputs):
+        # Drop the left padding, and anything past this prompt's own budget
+        tokens = output[padded_length - length:padded_length + budget]
+        generated = tokens[length:]
+        new_tokens += int((generated != tokenizer.eos_token_id).sum())
+        replies[i] = tokenizer.decode(tokens, skip_special_tokens=True)
+    return replies, new_tokens
+
+def generate_response(text):
+    replies, _ = generate_batch([text])
+    return replies[0]
+
+# Yield the reply a piece at a time as tokens come out of generate, which runs on
+# its own thread. Like generate_response the reply starts with the prompt. Closing
+# the generator early (e.g. the client went away) stops generation at the next token.
+def stream_response(text):
+    if not text:
+        yield NO_INPUT_REPLY
+        return
+    from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+    class StopWhenSet(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return stop.is_set()
+
+    tokenizer = get_tokenizer()
+    model = get_generation_model()
+    inputs = tokenizer(text, return_tensors='pt')
+    length = inputs['input_ids'].shape[1]
+    streamer = TextIteratorStreamer(tokenizer, skip_special_tokens=True)
+    stop = threading.Event()
+
+    def run():
+        try:
+            model.generate(
+                inputs['input_ids'],
+                attention_mask=inputs['attention_mask'],
+                max_new_tokens=max(1, MAX_LENGTH - length),
+                num_return_sequences=1,
+                pad_token_id=tokenizer.eos_token_id,
+                temperature=0.7,
+                top_p=0.9,
+                do_sample=True,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([StopWhenSet()])
+            )
+        except Exception as e:
+            print(f"Error streaming generation: {e}")
+            streamer.end()
+
+    threading.Thread(target=run, name='generation-stream', daemon=True).start()
+    try:
+        for piece in streamer:
+            if piece:
+                yield piece
+    finally:
+        stop.set()
+
+# Collects prompts from concurrent requests and runs them through generate_batch
+# together: a batch closes when it holds max_batch prompts or when its first prompt
+# has waited max_wait seconds, whichever comes first.
+class GenerationScheduler:
+    def __init__(self, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._prompts = 0
+        self._tokens = 0
+        self._busy_seconds = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='generation', daemon=True)
+                self._thread.start()
+
+    def submit(self, text):
+        self.start()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def generate(self, text):
+        return self.submit(text).result()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            texts = [text for text, _ in batch]
+            start = time.monotonic()
+            try:
+                replies, new_tokens = generate_batch(texts)
+            except Exception as e:
+                print(f"Error generating batch of {len(batch)}: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            seconds = time.monotonic() - start
+            for (_, future), reply in zip(batch, replies):
+                future.set_result(reply)
+            with self._stats_lock:
+                self._batches += 1
+                self._prompts += len(batch)
+                self._tokens += new_tokens
+                self._busy_seconds += seconds
+            print(f"Generated batch of {len(batch)} ({new_tokens} tokens) in {seconds:.2f}s")
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'backend': BACKEND,
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000,
+                'queued': self._queue.qsize(),
+                'batches': self._batches,
+                'prompts': self._prompts,
+                'average_batch_size': self._prompts / self._batches if self._batches else 0.0,
+                'tokens_generated': self._tokens,
+                'tokens_per_second': self._tokens / self._busy_seconds if self._busy_seconds else 0.0,
+            }
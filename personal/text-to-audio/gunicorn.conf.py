@@ -0,0 +1,32 @@
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_WORKERS', 2))
+# Threads so the WebSocket route and slow requests don't hold a whole worker
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = 300
+# Load the models once in the master; forked workers share the weights copy-on-write.
+# PRELOAD_MODELS=0 has every worker load its own copy instead.
+preload_app = os.environ.get('PRELOAD_MODELS', '1') == '1'
+
+# Every web worker starts its own recognition pool, so keep those small
+os.environ.setdefault('ASR_WORKERS', '1')
+
+def on_starting(server):
+    if preload_app:
+        import models
+        models.preload()
+        server.log.info("Models preloaded in the master")
+
+def post_worker_init(worker):
+    if not preload_app:
+        import models
+        models.preload()
+    # Fork the recognition workers before this worker starts its request threads
+    import app
+    app.asr_pool.start()
+    app.generation_scheduler.start()
+    # bench_startup.py counts these lines
+    worker.log.info("Worker %s ready", worker.pid)
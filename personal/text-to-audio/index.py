@@ -1,21 +1,25 @@
 import os
-import json
-import wave
+from concurrent.futures.process import BrokenProcessPool
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from vosk import Model, KaldiRecognizer
+from flask_sock import Sock
+import models
+from asr_pool import AsrBusy, AsrPool, AsrUnavailable
+from audio_io import AudioDecodeError, decode_to_pcm
+from streaming import handle_audio_socket
 
 # Initialize Flask app and CORS
 app = Flask(__name__)
 CORS(app)
+sock = Sock(app)
 
 # Folder to save the audio files
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Initialize the Vosk model
-model_path = os.path.abspath("model")
-vosk_model = Model(model_path)
+# Models load on first use (see models.py)
+# Uploads are recognized on a pool of worker processes; the live stream uses the model directly.
+asr_pool = AsrPool()
 
 @app.route('/save_audio', methods=['POST'])
 def save_audio():
@@ -31,25 +35,39 @@ def save_audio():
     print(f'Saved audio file to {file_path}')
 
     # Process the audio file
-    wf = wave.open(file_path, "rb")
-    if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != 16000:
-        print("Audio format is not correct")
-        return jsonify({'error': 'Audio format is not correct'}), 400
-
-    rec = KaldiRecognizer(vosk_model, wf.getframerate())
-    recognized_text = ""
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if rec.AcceptWaveform(data):
-            result = rec.Result()
-            recognized_text += json.loads(result)["text"] + " "
-    final_result = rec.FinalResult()
-    recognized_text += json.loads(final_result)["text"]
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    try:
+        pcm = decode_to_pcm(data)
+    except AudioDecodeError as e:
+        print(f"Error decoding audio: {e}")
+        return jsonify({'error': 'Invalid audio file'}), 400
+
+    try:
+        future = asr_pool.submit(pcm)
+        recognized_text, queue_wait, decode_time, skipped = future.result()
+    except AsrBusy as e:
+        print(f"Recognition queue full: {e}")
+        return jsonify({'error': 'Server busy, try again shortly'}), 429, {'Retry-After': '1'}
+    # A worker died under this job, or the pool could not be restarted
+    except (AsrUnavailable, BrokenProcessPool) as e:
+        print(f"Recognition failed: {e}")
+        return jsonify({'error': 'Speech recognition unavailable, try again shortly'}), 503, {'Retry-After': '1'}
     print(f"Recognized text: {recognized_text}")
+    print(f"Recognition waited {queue_wait:.2f}s in the queue, decoded in {decode_time:.2f}s, skipped {skipped:.2f}s of silence")
 
     return jsonify({'message': 'Audio file saved', 'file_path': file_path, 'recognized_text': recognized_text}), 200
 
+@app.route('/asr_stats', methods=['GET'])
+def asr_stats():
+    return jsonify(asr_pool.stats())
+
+# Live recognition: partial and final results while the audio is still arriving
+@sock.route('/stream_audio')
+def stream_audio(ws):
+    handle_audio_socket(ws, models.get_vosk_model())
+
 if __name__ == "__main__":
+    models.preload(llm=False)
+    asr_pool.start()
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,92 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from a quick WAV parse up to a long generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for key, (counts, total) in values.items():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", _format_number(bound)),))} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_number(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {counts[-1]}')
+        return lines
+
+# Everything registered so far, in the Prometheus text exposition format
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+stage_seconds = Histogram(
+    'voice_stage_seconds', 'Time spent in each stage of answering a voice request', ['stage'])
+request_seconds = Histogram(
+    'voice_request_seconds', 'Time from upload to the first byte of the spoken reply', ['mode'])
+
+# Stage timings for one request, kept in order for the Server-Timing header and
+# recorded in stage_seconds as they are added
+class StageTimer:
+    def __init__(self):
+        self.start = time.monotonic()
+        self.stages = []
+
+    def add(self, stage, seconds):
+        self.stages.append((stage, seconds))
+        stage_seconds.observe(seconds, stage=stage)
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(stage, time.monotonic() - start)
+
+    def total(self):
+        return time.monotonic() - self.start
+
+    def as_dict(self):
+        return {stage: round(seconds, 4) for stage, seconds in self.stages}
+
+    # Server-Timing durations are in milliseconds
+    def server_timing(self):
+        return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.stages)
@@ -0,0 +1,113 @@
+import gc
+import importlib.util
+import os
+import threading
+import time
+
+# Every model the voice app uses is loaded here, on first use, once per process.
+# Tools that never touch the LLM never import torch or transformers. A server that
+# forks (gunicorn with preload_app, the ASR pool) calls preload() first so its
+# children share the weights copy-on-write instead of each loading their own.
+
+MODEL_NAME = os.environ.get('GPT2_MODEL', 'gpt2')
+# eager: the float32 PyTorch model as loaded
+# int8:  the same model with its linear layers dynamically quantized to int8
+# onnx:  an ONNX Runtime export with the KV cache (needs optimum[onnxruntime])
+BACKEND = os.environ.get('GEN_BACKEND', 'eager')
+BACKENDS = ('eager', 'int8', 'onnx')
+# Intra-op threads for PyTorch / ONNX Runtime; 0 keeps the library default (all cores)
+THREADS = int(os.environ.get('GENERATION_THREADS', 0))
+# Load weights from safetensors, which are memory-mapped: a cold start reads them
+# from the page cache instead of unpickling a copy. MODEL_MMAP=0 allows .bin files.
+USE_MMAP = os.environ.get('MODEL_MMAP', '1') == '1'
+VOSK_MODEL_PATH = os.path.abspath(os.environ.get('VOSK_MODEL_PATH', 'model'))
+
+_loaded = {}
+_lock = threading.Lock()
+
+def _get(name, loader):
+    with _lock:
+        if name not in _loaded:
+            start = time.monotonic()
+            _loaded[name] = loader()
+            print(f"Loaded {name} in {time.monotonic() - start:.2f}s")
+        return _loaded[name]
+
+# GPT-2's attention and MLP projections are transformers' Conv1D, a linear layer with
+# its weight stored transposed. quantize_dynamic only knows nn.Linear, so swap them
+# for equivalent nn.Linear layers first.
+def _conv1d_to_linear(module):
+    import torch
+    from transformers.pytorch_utils import Conv1D
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features)
+            linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+            linear.bias = torch.nn.Parameter(child.bias.detach())
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+def load_gpt2(backend=BACKEND, model_name=MODEL_NAME):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown generation backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == 'onnx':
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForCausalLM
+        except ImportError:
+            raise RuntimeError("GEN_BACKEND=onnx needs optimum[onnxruntime] installed")
+        options = onnxruntime.SessionOptions()
+        if THREADS:
+            options.intra_op_num_threads = THREADS
+        return ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True, session_options=options)
+
+    import torch
+    from transformers import GPT2LMHeadModel
+    if THREADS:
+        torch.set_num_threads(THREADS)
+    options = {}
+    if USE_MMAP:
+        options['use_safetensors'] = True
+        # Skips building randomly initialized weights only to overwrite them
+        if importlib.util.find_spec('accelerate') is not None:
+            options['low_cpu_mem_usage'] = True
+    loaded = GPT2LMHeadModel.from_pretrained(model_name, **options)
+    loaded.eval()
+    if backend == 'int8':
+        _conv1d_to_linear(loaded)
+        loaded = torch.quantization.quantize_dynamic(loaded, {torch.nn.Linear}, dtype=torch.qint8)
+    return loaded
+
+def _load_tokenizer():
+    from transformers import GPT2Tokenizer
+    tokenizer = GPT2Tokenizer.from_pretrained(MODEL_NAME)
+    # GPT-2 has no pad token and generates left to right, so batches are padded on the left
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = 'left'
+    return tokenizer
+
+def get_tokenizer():
+    return _get(f'{MODEL_NAME} tokenizer', _load_tokenizer)
+
+def get_generation_model():
+    return _get(f'{MODEL_NAME} ({BACKEND})', load_gpt2)
+
+def get_vosk_model(path=VOSK_MODEL_PATH):
+    def load():
+        from vosk import Model
+        return Model(path)
+    return _get(f'vosk model {path}', load)
+
+# Load everything now, then move the objects made so far into the garbage collector's
+# permanent generation: collections in forked children would otherwise write to their
+# headers and un-share the pages they sit on
+def preload(llm=True, asr=True):
+    if asr:
+        get_vosk_model()
+    if llm:
+        get_tokenizer()
+        get_generation_model()
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,37 @@
+import json
+import os
+from vosk import KaldiRecognizer
+from vad import find_speech
+
+SAMPLE_RATE = 16000
+# 4000 frames of 16-bit audio per AcceptWaveform call, as the file loops read them
+CHUNK_BYTES = 4000 * 2
+# Skip silence before decoding; VAD=0 decodes every frame as before
+VAD_ENABLED = os.environ.get('VAD', '1') == '1'
+
+def _decode(model, view, sample_rate):
+    rec = KaldiRecognizer(model, sample_rate)
+    recognized_text = ""
+    for start in range(0, len(view), CHUNK_BYTES):
+        # The memoryview slice is free; vosk's C call still needs a bytes object
+        if rec.AcceptWaveform(bytes(view[start:start + CHUNK_BYTES])):
+            result = rec.Result()
+            recognized_text += json.loads(result)["text"] + " "
+    final_result = rec.FinalResult()
+    recognized_text += json.loads(final_result)["text"]
+    return recognized_text.strip()
+
+# Run 16-bit mono PCM held in memory through the recognizer. With VAD on only the
+# speech segments are decoded, each by its own recognizer. Returns the text and
+# the seconds of silence that were skipped.
+def recognize_pcm(model, pcm, sample_rate=SAMPLE_RATE, use_vad=VAD_ENABLED):
+    view = memoryview(pcm)
+    if not use_vad:
+        return _decode(model, view, sample_rate), 0.0
+    speech = find_speech(pcm, sample_rate)
+    if not speech.segments and speech.audible:
+        # The VAD found nothing in audio that isn't silent; better to decode it all
+        # than to answer with no text
+        return _decode(model, view, sample_rate), 0.0
+    texts = [_decode(model, view[start:end], sample_rate) for start, end in speech.segments]
+    return " ".join(text for text in texts if text), speech.skipped_seconds
@@ -0,0 +1,90 @@
+import os
+import queue
+import re
+import threading
+from tts import synthesize
+
+# Sentences shorter than this are held back and joined to the next one, so a
+# reply doesn't turn into many tiny TTS requests
+MIN_SENTENCE_CHARS = int(os.environ.get('PIPELINE_MIN_CHARS', 20))
+# Text without any sentence end is cut at the last space past this length
+MAX_SENTENCE_CHARS = int(os.environ.get('PIPELINE_MAX_CHARS', 200))
+# mp3 chunks buffered between the TTS thread and the response
+AUDIO_QUEUE_SIZE = 64
+READ_CHUNK_BYTES = 32 * 1024
+
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+# Turn a stream of text pieces into complete sentences as soon as each one ends
+def split_sentences(pieces, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+    buffer = ''
+    try:
+        for piece in pieces:
+            buffer += piece
+            while True:
+                cut = None
+                for match in SENTENCE_END.finditer(buffer):
+                    if match.end() >= min_chars:
+                        cut = match.end()
+                        break
+                if cut is None and len(buffer) > max_chars:
+                    space = buffer.rfind(' ', 0, max_chars)
+                    cut = space + 1 if space > 0 else max_chars
+                if cut is None:
+                    break
+                sentence, buffer = buffer[:cut].strip(), buffer[cut:]
+                if sentence:
+                    yield sentence
+    finally:
+        if hasattr(pieces, 'close'):
+            pieces.close()
+    if buffer.strip():
+        yield buffer.strip()
+
+# Speak each sentence as it arrives and yield the mp3 chunks in order. TTS runs on
+# its own thread, so the next sentence is being synthesized while the previous
+# one's audio is still going out to the client.
+def speak_sentences(sentences, lang='en'):
+    chunks = queue.Queue(maxsize=AUDIO_QUEUE_SIZE)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run():
+        try:
+            for number, sentence in enumerate(sentences, 1):
+                audio = synthesize(sentence, lang)
+                print(f"Spoke sentence {number} with {audio.engine} ({'cached' if audio.hit else 'new'}): {sentence}")
+                with open(audio.path, 'rb') as f:
+                    while True:
+                        chunk = f.read(READ_CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        if not put(chunk):
+                            return
+        except Exception as e:
+            put(e)
+        finally:
+            # Stops generation too when the client went away early
+            sentences.close()
+            put(done)
+
+    threading.Thread(target=run, name='tts-pipeline', daemon=True).start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
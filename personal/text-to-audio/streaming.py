@@ -0,0 +1,71 @@
+import json
+from flask import request
+from simple_websocket import ConnectionClosed
+from vosk import KaldiRecognizer
+
+SAMPLE_RATE = 16000
+
+# Wraps one KaldiRecognizer for a live audio stream, turning its results into
+# the messages sent to the client
+class StreamingRecognizer:
+    def __init__(self, model, sample_rate=SAMPLE_RATE):
+        self.rec = KaldiRecognizer(model, sample_rate)
+        self.texts = []
+
+    # Feed a block of 16-bit mono PCM; returns a partial or a finished utterance
+    def accept(self, data):
+        if self.rec.AcceptWaveform(data):
+            text = json.loads(self.rec.Result())["text"]
+            if text:
+                self.texts.append(text)
+            return {'text': text, 'final': False}
+        return {'partial': json.loads(self.rec.PartialResult())["partial"]}
+
+    # Flush the recognizer; the final message carries the whole transcript
+    def finish(self):
+        text = json.loads(self.rec.FinalResult())["text"]
+        if text:
+            self.texts.append(text)
+        return {'text': " ".join(self.texts), 'final': True}
+
+# WebSocket protocol: the client sends binary messages of 16-bit mono PCM at
+# ?sample_rate= (default 16000) and a text message "EOF" (or {"eof": 1}) when done.
+# The server answers every block with {"partial": ...} or {"text": ..., "final": false}
+# and ends with {"text": <full transcript>, "final": true}.
+def handle_audio_socket(ws, model):
+    sample_rate = int(request.args.get('sample_rate', SAMPLE_RATE))
+    session = StreamingRecognizer(model, sample_rate)
+    last_partial = None
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            if isinstance(message, str):
+                if is_eof(message):
+                    break
+                continue
+
+            result = session.accept(message)
+            # Partials repeat while nothing new was heard; only send changes
+            if 'partial' in result:
+                if result['partial'] == last_partial:
+                    continue
+                last_partial = result['partial']
+            else:
+                last_partial = None
+            ws.send(json.dumps(result))
+
+        final = session.finish()
+        print(f"Streamed recognized text: {final['text']}")
+        ws.send(json.dumps(final))
+    except ConnectionClosed:
+        print("Audio stream closed by client")
+
+def is_eof(message):
+    if message.strip() == 'EOF':
+        return True
+    try:
+        return bool(json.loads(message).get('eof'))
+    except (ValueError, AttributeError):
+        return False
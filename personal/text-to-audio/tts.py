@@ -0,0 +1,131 @@
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+from collections import namedtuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get('TTS_CACHE_DIR', os.path.join(HERE, 'tts_cache'))
+# The cache deletes its least recently used files past this size
+CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MB', 200)) * 1024 * 1024
+# Engines tried in order on a cache miss; pyttsx3 works offline
+ENGINE_ORDER = os.environ.get('TTS_ENGINES', 'gtts,pyttsx3').split(',')
+# gTTS voice is the Google domain (accent); pyttsx3 voice is a voice id
+VOICES = {
+    'gtts': os.environ.get('TTS_GTTS_VOICE', 'com'),
+    'pyttsx3': os.environ.get('TTS_PYTTSX3_VOICE', ''),
+}
+MIMETYPE = 'audio/mpeg'
+
+CachedAudio = namedtuple('CachedAudio', ['path', 'key', 'engine', 'hit'])
+
+class TTSError(Exception):
+    pass
+
+class GttsEngine:
+    name = 'gtts'
+
+    def synthesize(self, text, lang, voice):
+        from gtts import gTTS
+        return b''.join(gTTS(text=text, lang=lang, tld=voice or 'com').stream())
+
+# Local speech through pyttsx3 (espeak / SAPI / NSSpeechSynthesizer), encoded to mp3
+# with ffmpeg so cached files are the same format whichever engine made them
+class Pyttsx3Engine:
+    name = 'pyttsx3'
+
+    def __init__(self):
+        # pyttsx3 drives one speech engine per process and is not thread-safe
+        self._lock = threading.Lock()
+        self._engine = None
+
+    def synthesize(self, text, lang, voice):
+        import pyttsx3
+        with self._lock:
+            if self._engine is None:
+                self._engine = pyttsx3.init()
+            if voice:
+                self._engine.setProperty('voice', voice)
+            fd, wav_path = tempfile.mkstemp(suffix='.wav', dir=CACHE_DIR)
+            os.close(fd)
+            try:
+                self._engine.save_to_file(text, wav_path)
+                self._engine.runAndWait()
+                command = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', wav_path, '-f', 'mp3', 'pipe:1']
+                result = subprocess.run(command, capture_output=True, check=True)
+            finally:
+                os.remove(wav_path)
+        return result.stdout
+
+ENGINES = {engine.name: engine for engine in (GttsEngine(), Pyttsx3Engine())}
+
+_lock = threading.Lock()
+
+def cache_key(text, lang, voice):
+    return hashlib.sha256(f"{text}|{lang}|{voice}".encode('utf-8')).hexdigest()
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.mp3")
+
+def _evict(keep):
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith('.mp3') or name == keep:
+            continue
+        try:
+            info = os.stat(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            continue
+        entries.append((info.st_mtime, info.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    # Oldest use first; a hit touches its file's mtime
+    for _, size, name in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def _store(key, audio):
+    path = _cache_path(key)
+    fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=CACHE_DIR)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(audio)
+    # Readers only ever see a complete file
+    os.replace(tmp_path, path)
+    with _lock:
+        _evict(keep=os.path.basename(path))
+    return path
+
+# Return the mp3 for this text from the cache, synthesizing it on a miss with the
+# first engine in TTS_ENGINES that works. The key doubles as the file's ETag.
+def synthesize(text, lang='en', engines=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    names = [name for name in (engines or ENGINE_ORDER) if name in ENGINES]
+    for name in names:
+        key = cache_key(text, lang, f"{name}:{VOICES.get(name, '')}")
+        path = _cache_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            continue
+        return CachedAudio(path, key, name, True)
+
+    errors = []
+    for name in names:
+        voice = VOICES.get(name, '')
+        try:
+            audio = ENGINES[name].synthesize(text, lang, voice)
+        except Exception as e:
+            print(f"TTS engine {name} failed: {e}")
+            errors.append(f"{name}: {e}")
+            continue
+        if not audio:
+            errors.append(f"{name}: no audio")
+            continue
+        key = cache_key(text, lang, f"{name}:{voice}")
+        return CachedAudio(_store(key, audio), key, name, False)
+    raise TTSError("; ".join(errors) or "No TTS engine available")
@@ -0,0 +1,113 @@
+import os
+from collections import namedtuple
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+# energy: NumPy energy + zero-crossing detector, no extra dependency
+# webrtc: the WebRTC detector (pip install webrtcvad), falls back to energy if missing
+BACKEND = os.environ.get('VAD_BACKEND', 'energy')
+FRAME_MS = 30
+# Frames this far above the noise floor are speech
+MARGIN_DB = float(os.environ.get('VAD_MARGIN_DB', 12))
+# Nothing quieter than this is speech, however quiet the recording
+FLOOR_DB = float(os.environ.get('VAD_FLOOR_DB', -55))
+# Quieter frames still count when they hiss like a fricative (s, f, sh)
+FRICATIVE_ZCR = 0.25
+WEBRTC_AGGRESSIVENESS = int(os.environ.get('VAD_AGGRESSIVENESS', 2))
+# Speech kept on either side of a detected region so word edges aren't clipped
+PAD_MS = int(os.environ.get('VAD_PAD_MS', 300))
+# Pauses shorter than this stay inside a segment
+MIN_SILENCE_MS = int(os.environ.get('VAD_MIN_SILENCE_MS', 600))
+# Shorter blips (clicks, breaths) are dropped
+MIN_SPEECH_MS = 120
+# Longer segments are split at their quietest frame
+MAX_SEGMENT_SECONDS = float(os.environ.get('VAD_MAX_SEGMENT_SECONDS', 30))
+
+# segments are (start, end) byte offsets into the PCM; audible is whether any frame
+# is louder than FLOOR_DB, i.e. the clip isn't just digital silence
+VadResult = namedtuple('VadResult', ['segments', 'total_seconds', 'speech_seconds', 'skipped_seconds', 'audible'])
+
+def _frame_energy_db(frames):
+    power = np.mean(frames.astype(np.float32) ** 2, axis=1)
+    return 10 * np.log10(power / (32768.0 ** 2) + 1e-10)
+
+def _zero_crossing_rate(frames):
+    signs = np.signbit(frames)
+    return np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+def _energy_speech_frames(frames):
+    energy = _frame_energy_db(frames)
+    zcr = _zero_crossing_rate(frames)
+    noise_floor, loud = np.percentile(energy, [10, 90])
+    # A clip without MARGIN_DB of level change has no silence to measure a floor from:
+    # it is speech from end to end (trimmed, AGC'd, over steady noise) or all silence
+    if loud - noise_floor < MARGIN_DB:
+        return energy > FLOOR_DB, energy
+    threshold = max(FLOOR_DB, noise_floor + MARGIN_DB)
+    voiced = energy > threshold
+    fricative = (energy > threshold - MARGIN_DB / 2) & (zcr > FRICATIVE_ZCR)
+    return voiced | fricative, energy
+
+def _webrtc_speech_frames(frames, sample_rate):
+    detector = webrtcvad.Vad(WEBRTC_AGGRESSIVENESS)
+    speech = np.array([detector.is_speech(frame.tobytes(), sample_rate) for frame in frames])
+    return speech, _frame_energy_db(frames)
+
+# Runs of True in a boolean array as (start, end) index pairs
+def _runs(mask):
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+def _split_long(start, end, energy, max_frames):
+    if end - start <= max_frames:
+        return [(start, end)]
+    # Cut at the quietest frame of the middle half
+    low, high = start + (end - start) // 4, end - (end - start) // 4
+    cut = low + int(np.argmin(energy[low:high]))
+    return _split_long(start, cut, energy, max_frames) + _split_long(cut, end, energy, max_frames)
+
+# Find the speech in 16-bit mono PCM. Silence before, after and between segments is
+# skipped; each segment can be decoded on its own.
+def find_speech(pcm, sample_rate):
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    frame_length = sample_rate * FRAME_MS // 1000
+    frame_count = len(samples) // frame_length
+    total_seconds = len(samples) / sample_rate
+    if frame_count == 0:
+        return VadResult([(0, len(pcm))] if len(pcm) else [], total_seconds, total_seconds, 0.0, bool(len(pcm)))
+
+    frames = samples[:frame_count * frame_length].reshape(frame_count, frame_length)
+    if BACKEND == 'webrtc' and webrtcvad is not None and sample_rate in (8000, 16000, 32000, 48000):
+        speech, energy = _webrtc_speech_frames(frames, sample_rate)
+    else:
+        speech, energy = _energy_speech_frames(frames)
+
+    pad = PAD_MS // FRAME_MS
+    min_silence = MIN_SILENCE_MS // FRAME_MS
+    min_speech = max(1, MIN_SPEECH_MS // FRAME_MS)
+    max_frames = max(1, int(MAX_SEGMENT_SECONDS * 1000 / FRAME_MS))
+
+    regions = [(start, end) for start, end in _runs(speech) if end - start >= min_speech]
+    merged = []
+    for start, end in regions:
+        start, end = max(0, start - pad), min(frame_count, end + pad)
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    segments = []
+    for start, end in merged:
+        for seg_start, seg_end in _split_long(start, end, energy, max_frames):
+            byte_start = int(seg_start) * frame_length * 2
+            # The last segment keeps the samples past the final whole frame
+            byte_end = len(pcm) if seg_end == frame_count else int(seg_end) * frame_length * 2
+            segments.append((byte_start, byte_end))
+
+    speech_seconds = sum(end - start for start, end in segments) / 2 / sample_rate
+    audible = bool(np.any(energy > FLOOR_DB))
+    return VadResult(segments, total_seconds, speech_seconds, total_seconds - speech_seconds, audible)
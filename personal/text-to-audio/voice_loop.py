@@ -0,0 +1,207 @@
+import json
+import os
+import queue
+import threading
+import time
+import sounddevice as sd
+import vosk
+from generation import stream_response
+from models import get_generation_model, get_vosk_model
+from tts import synthesize
+
+SAMPLE_RATE = 16000
+BLOCK_FRAMES = 8000
+# Seconds of microphone audio the ring buffer holds while recognition catches up
+RING_SECONDS = int(os.environ.get('VOICE_RING_SECONDS', 30))
+# Utterances / replies waiting for the next stage; the oldest is dropped past this
+QUEUE_SIZE = int(os.environ.get('VOICE_QUEUE_SIZE', 2))
+# Speaking this many words over a reply cancels it. With 0 (the default) the
+# microphone is ignored while a reply plays, since through speakers the recognizer
+# would hear the reply itself; turn it on only with headphones or echo cancellation.
+BARGE_IN_WORDS = int(os.environ.get('VOICE_BARGE_IN_WORDS', 0))
+POLL_SECONDS = 0.01
+
+# Single-producer single-consumer byte ring. The audio callback is the only writer of
+# _write and the recognition thread the only writer of _read, so neither side takes
+# a lock; a write that doesn't fit is dropped whole and counted as an overrun.
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._write = 0
+        self._read = 0
+        self.overruns = 0
+        self.dropped_bytes = 0
+
+    def write(self, data):
+        size = len(data)
+        if size > self.capacity - (self._write - self._read):
+            self.overruns += 1
+            self.dropped_bytes += size
+            return False
+        start = self._write % self.capacity
+        first = min(size, self.capacity - start)
+        self._buffer[start:start + first] = data[:first]
+        self._buffer[:size - first] = data[first:]
+        self._write += size
+        return True
+
+    def read(self, max_bytes):
+        size = min(max_bytes, self._write - self._read)
+        if size <= 0:
+            return b''
+        start = self._read % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self._buffer[start:start + first]) + bytes(self._buffer[:size - first])
+        self._read += size
+        return data
+
+# Plays nothing itself: play(path, cancel) is handed the mp3 and an Event that is set
+# when the user talks over the reply, and should return early when it can
+class VoiceSession:
+    def __init__(self, play, model_path=None):
+        self.play = play
+        self.model = get_vosk_model(model_path) if model_path else get_vosk_model()
+        self.ring = RingBuffer(RING_SECONDS * SAMPLE_RATE * 2)
+        self.utterances = queue.Queue(maxsize=QUEUE_SIZE)
+        self.replies = queue.Queue(maxsize=QUEUE_SIZE)
+        self.stopping = threading.Event()
+        # Set while a reply is playing
+        self.speaking = threading.Event()
+        self._turn_cancel = threading.Event()
+        self.input_overflows = 0
+        self.dropped_utterances = 0
+        self.dropped_replies = 0
+        self.barge_ins = 0
+
+    # Runs on PortAudio's thread: copy the block into the ring and return
+    def callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.input_overflows += 1
+        if self.speaking.is_set() and not BARGE_IN_WORDS:
+            return
+        self.ring.write(bytes(indata))
+
+    # Put without blocking, making room by dropping the oldest item; True if one was dropped
+    def _offer(self, q, item):
+        try:
+            q.put_nowait(item)
+            return False
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+            q.put_nowait(item)
+            return True
+
+    # Cancel whatever is being generated or played and start a new turn
+    def _new_turn(self):
+        self._turn_cancel.set()
+        self._turn_cancel = threading.Event()
+        return self._turn_cancel
+
+    def recognize(self):
+        rec = vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+        last_partial = ''
+        # Whether the user has talked over the reply that is playing
+        barged_in = False
+        while not self.stopping.is_set():
+            data = self.ring.read(BLOCK_FRAMES * 2)
+            if not data:
+                time.sleep(POLL_SECONDS)
+                continue
+            if rec.AcceptWaveform(data):
+                text = json.loads(rec.Result())["text"]
+                last_partial = ''
+                interrupted, barged_in = barged_in, False
+                if not text:
+                    continue
+                # Without a barge-in, words heard during playback are the reply's echo
+                if self.speaking.is_set() and not interrupted:
+                    print("Ignored while speaking:", text)
+                    continue
+                print("Recognized text:", text)
+                # A new utterance replaces whatever is still being answered
+                if self._offer(self.utterances, (text, self._new_turn())):
+                    self.dropped_utterances += 1
+            else:
+                partial = json.loads(rec.PartialResult())["partial"]
+                if partial and partial != last_partial:
+                    print(partial)
+                    if BARGE_IN_WORDS and len(partial.split()) >= BARGE_IN_WORDS > len(last_partial.split()):
+                        self.barge_ins += 1
+                        barged_in = True
+                        self._new_turn()
+                last_partial = partial
+
+    def generate(self):
+        while not self.stopping.is_set():
+            try:
+                text, cancel = self.utterances.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            pieces = stream_response(text)
+            response = ''
+            try:
+                for piece in pieces:
+                    if cancel.is_set():
+                        break
+                    response += piece
+            finally:
+                pieces.close()
+            if cancel.is_set():
+                print("Response cancelled")
+                continue
+            print("Response:", response)
+            if self._offer(self.replies, (response, cancel)):
+                self.dropped_replies += 1
+
+    def speak(self):
+        while not self.stopping.is_set():
+            try:
+                response, cancel = self.replies.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if cancel.is_set():
+                continue
+            try:
+                path = synthesize(response).path
+                self.speaking.set()
+                try:
+                    self.play(path, cancel)
+                finally:
+                    self.speaking.clear()
+            except Exception as e:
+                print(f"Error playing response: {e}")
+
+    # Listen until Ctrl+C
+    def run(self):
+        # Load GPT-2 now rather than while the first reply is awaited
+        get_generation_model()
+        threads = [threading.Thread(target=target, name=target.__name__, daemon=True)
+                   for target in (self.recognize, self.generate, self.speak)]
+        for thread in threads:
+            thread.start()
+        try:
+            with sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=BLOCK_FRAMES, dtype='int16',
+                                   channels=1, callback=self.callback):
+                print("Say something... (Ctrl+C to stop)")
+                while True:
+                    time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopping.set()
+            self._turn_cancel.set()
+            for thread in threads:
+                thread.join(timeout=2)
+            self.report()
+
+    def report(self):
+        print()
+        print(f"Ring buffer overruns:  {self.ring.overruns} ({self.ring.dropped_bytes / 2 / SAMPLE_RATE:.2f}s of audio dropped)")
+        print(f"Input overflows:       {self.input_overflows}")
+        print(f"Dropped utterances:    {self.dropped_utterances}")
+        print(f"Dropped replies:       {self.dropped_replies}")
+        print(f"Barge-ins:             {self.barge_ins}")
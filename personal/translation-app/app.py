@@ -1,123 +1,351 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context, url_for
 from flask_cors import CORS
-from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_pool import DriverPool, get_driver_path
+from executor import NOT_FOUND, shutdown_executor, translate_all
+from waits import current_text, wait_for_element, wait_for_new_text
+from batching import join_batch, pack_batches, split_batch_output
+from translation_memory import TranslationMemory
+from jobs import JobScheduler
+from metrics import Gauge, render_metrics, request_seconds, start_trace, timed
+import atexit
+import json
+import os
+import threading
 import time
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS
 
-def find_element_with_retries(driver, by, value, retries=5, delay=1):
-    for i in range(retries):
-        try:
-            element = driver.find_element(by, value)
-            return element
-        except Exception as e:
-            if i < retries - 1:
-                time.sleep(delay)
-            else:
-                raise e
+SOURCE_LANG = 'en'
+TARGET_LANG = 'bn'
+
+# Finished translations, so repeated sentences never reach a browser
+translation_memory = TranslationMemory()
+
+# Engine pages; can be pointed at the local stand-ins in standins/ for benchmarks
+QUILLBOT_URL = os.environ.get('QUILLBOT_URL', "https://quillbot.com/translate")
+GOOGLE_URL = os.environ.get('GOOGLE_TRANSLATE_URL', f"https://translate.google.com/?sl={SOURCE_LANG}&tl={TARGET_LANG}&op=translate")
+# Google Translate takes up to 5000 characters per submission; keep some headroom
+GOOGLE_BATCH_CHARS = int(os.environ.get('GOOGLE_BATCH_CHARS', 4500))
+GOOGLE_BATCHING = os.environ.get('GOOGLE_BATCHING', '1') == '1'
+
+# Seconds between keepalive lines on an idle result stream
+STREAM_KEEPALIVE = 15
+
+# Elements holding the translated text
+QUILLBOT_OUTPUT = 'span[id^="output-sentence"]'
+GOOGLE_OUTPUT = 'span[jsname="W297wb"]'
 
 def translate_to_bengali_quillbot(sentences):
-    options = webdriver.ChromeOptions()
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.headless = False
-    
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    
-    driver.get("https://quillbot.com/translate")
-    time.sleep(5)  # Wait for the page to fully load
-
-    translations = []
-    
-    try:
-        output_lang_button = find_element_with_retries(driver, By.XPATH, "(//button[@class='MuiButton-root MuiButton-text MuiButton-textPrimary MuiButton-sizeMedium MuiButton-textSizeMedium MuiButtonBase-root css-1uayg5t'])[2]")
-        output_lang_button.click()
-        time.sleep(1)
-        bengali_button = find_element_with_retries(driver, By.XPATH, "//li[@value='TSTOOL-LP-BENGALI-1696404055791']")
-        bengali_button.click()
-        time.sleep(1)
-    except Exception as e:
-        print(f"Error selecting output language: {e}")
-        driver.quit()
-        return []
+    return translate_sentences(sentences, ['quillbot'])['quillbot']
+
+# Open Quillbot and switch the output language; pooled sessions keep this state
+def setup_quillbot(driver):
+    with timed('quillbot', 'page_load'):
+        driver.get(QUILLBOT_URL)
+    output_lang_button = wait_for_element(driver, By.XPATH, "(//button[@class='MuiButton-root MuiButton-text MuiButton-textPrimary MuiButton-sizeMedium MuiButton-textSizeMedium MuiButtonBase-root css-1uayg5t'])[2]", step='quillbot_language_button', clickable=True)
+    output_lang_button.click()
+    bengali_button = wait_for_element(driver, By.XPATH, "//li[@value='TSTOOL-LP-BENGALI-1696404055791']", step='quillbot_language_option', clickable=True)
+    bengali_button.click()
+
+# Yields one translation per sentence, in order, as each one finishes
+def quillbot_translate_with_driver(driver, sentences):
+    # Sessions from the pool are already on the page with Bengali selected
+    if not driver.current_url.startswith(QUILLBOT_URL):
+        try:
+            setup_quillbot(driver)
+        except Exception as e:
+            print(f"Error selecting output language: {e}")
+            # Make sure the next request sets the page up again
+            driver.get('about:blank')
+            for _ in sentences:
+                yield NOT_FOUND
+            return
 
     for sentence in sentences:
         try:
-            input_box = find_element_with_retries(driver, By.ID, 'translate-input-box')
-            input_box.clear()
-            input_box.send_keys(sentence)
-            time.sleep(1)
+            previous_text = current_text(driver, QUILLBOT_OUTPUT)
+            input_box = wait_for_element(driver, By.ID, 'translate-input-box', step='quillbot_input')
+            with timed('quillbot', 'type'):
+                input_box.clear()
+                input_box.send_keys(sentence)
         except Exception as e:
             print(f"Error entering text: {e}")
+            yield NOT_FOUND
             continue
         
         try:
-            translate_button = find_element_with_retries(driver, By.XPATH, "//button[@type='button' and .//span[text()='Translate']]")
+            translate_button = wait_for_element(driver, By.XPATH, "//button[@type='button' and .//span[text()='Translate']]", step='quillbot_translate_button', clickable=True)
             translate_button.click()
-            time.sleep(2)  # Wait for the translation to complete
         except Exception as e:
             print(f"Error clicking translate button: {e}")
+            yield NOT_FOUND
             continue
         
         try:
-            translated_text = find_element_with_retries(driver, By.CSS_SELECTOR, 'span[id^="output-sentence"]').text
-        except Exception as e:
-            translated_text = "Translation not found"
+            translated_text = wait_for_new_text(driver, QUILLBOT_OUTPUT, previous_text, step='quillbot_output')
+        except TimeoutException as e:
+            # Output that never changed still shows the previous sentence's translation
+            translated_text = current_text(driver, QUILLBOT_OUTPUT)
+            if not translated_text or translated_text == previous_text:
+                translated_text = NOT_FOUND
             print(f"Error fetching translated text: {e}")
-        translations.append(translated_text)
         print(f"Translated: '{sentence}' to '{translated_text}'")
-        time.sleep(1)
-
-    driver.quit()
-    return translations
+        yield translated_text
 
 def translate_to_bengali_google(sentences):
-    options = webdriver.ChromeOptions()
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.headless = False
-
-   
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    
-    translations = []
-    for sentence in sentences:
-        driver.get("https://translate.google.com/?sl=en&tl=bn&op=translate")
-        time.sleep(2)
-        input_box = driver.find_element(By.CSS_SELECTOR, 'textarea[aria-label="Source text"]')
-        input_box.clear()
-        input_box.send_keys(sentence)
-        time.sleep(2)
-        try:
-            translated_text = driver.find_element(By.CSS_SELECTOR, 'span[jsname="W297wb"]').text
-        except:
-            translated_text = "Translation not found"
-        translations.append(translated_text)
-        print(f"Translated: '{sentence}' to '{translated_text}'")
-        time.sleep(2)
+    return translate_sentences(sentences, ['google'])['google']
+
+# Yields one translation per sentence, in order, as each one (or each batch) finishes
+def google_translate_with_driver(driver, sentences):
+    if not GOOGLE_BATCHING:
+        for sentence in sentences:
+            yield google_translate_one(driver, sentence)
+        return
+
+    for batch in pack_batches(sentences, GOOGLE_BATCH_CHARS):
+        if len(batch) > 1:
+            batch_translations = google_translate_batch(driver, batch)
+            if batch_translations is not None:
+                for sentence, translated_text in zip(batch, batch_translations):
+                    print(f"Translated: '{sentence}' to '{translated_text}'")
+                    yield translated_text
+                continue
+            print(f"Could not split a batch of {len(batch)} sentences, translating them one at a time")
+        for sentence in batch:
+            yield google_translate_one(driver, sentence)
+
+# Navigate to a blank Google Translate page, unless the session is already on one
+def load_google_page(driver):
+    if driver.current_url == GOOGLE_URL and driver.execute_script(
+            "var box = document.querySelector('textarea[aria-label=\"Source text\"]');"
+            "return box !== null && box.value === '';"):
+        return
+    with timed('google', 'page_load'):
+        driver.get(GOOGLE_URL)
+
+def google_translate_one(driver, sentence):
+    load_google_page(driver)
+    try:
+        input_box = wait_for_element(driver, By.CSS_SELECTOR, 'textarea[aria-label="Source text"]', step='google_input')
+        with timed('google', 'type'):
+            input_box.clear()
+            input_box.send_keys(sentence)
+        translated_text = wait_for_new_text(driver, GOOGLE_OUTPUT, step='google_output')
+    except TimeoutException as e:
+        print(f"Error fetching translated text: {e}")
+        translated_text = NOT_FOUND
+    print(f"Translated: '{sentence}' to '{translated_text}'")
+    return translated_text
+
+# Submit several sentences as one text, one per line, and split the result back up.
+# Returns None when the output lines don't match the input sentences.
+def google_translate_batch(driver, batch):
+    load_google_page(driver)
+    try:
+        input_box = wait_for_element(driver, By.CSS_SELECTOR, 'textarea[aria-label="Source text"]', step='google_input')
+        with timed('google', 'type'):
+            input_box.clear()
+            input_box.send_keys(join_batch(batch))
+        text = wait_for_new_text(driver, GOOGLE_OUTPUT, step='google_batch_output', joined=True)
+        lines = split_batch_output(text, len(batch))
+        if lines is None:
+            # Long batches can render in pieces; give the rest a moment to arrive
+            text = wait_for_new_text(driver, GOOGLE_OUTPUT, text, step='google_batch_output', timeout=3, joined=True)
+            lines = split_batch_output(text, len(batch))
+    except TimeoutException as e:
+        print(f"Error fetching batch translation: {e}")
+        return None
+    return lines
+
+# Long-lived browser sessions shared by all requests, one pool per engine.
+# New sessions are opened on the engine's page, ready to translate.
+# Each engine runs the 'lean' browser profile unless <ENGINE>_PROFILE=full.
+quillbot_pool = DriverPool('quillbot', setup=setup_quillbot, profile=os.environ.get('QUILLBOT_PROFILE', 'lean'))
+google_pool = DriverPool('google', setup=load_google_page, profile=os.environ.get('GOOGLE_PROFILE', 'lean'))
+
+# Engine name -> (browser pool, generator translating a list of sentences on one driver)
+ENGINES = {
+    'quillbot': (quillbot_pool, quillbot_translate_with_driver),
+    'google': (google_pool, google_translate_with_driver),
+}
+
+def translate_sentences(sentences, engine_names=None, on_result=None, cancel=None):
+    engines = {name: ENGINES[name] for name in (engine_names or ENGINES)}
+    return translate_all(engines, sentences, translation_memory, SOURCE_LANG, TARGET_LANG, on_result, cancel)
 
-    driver.quit()
-    return translations
+def run_translation_job(job):
+    print(f"Job {job.id}: translating {len(job.sentences)} sentences")
+    translate_sentences(job.sentences, job.engines, on_result=job.add_result, cancel=job.cancel_event)
 
+# Background queue behind the /jobs endpoints
+job_scheduler = JobScheduler(run_translation_job)
+
+# Add ?trace=1 to get the timing of every stage of this request back with the result
 @app.route('/translate', methods=['POST'])
 def translate():
     data = request.json
     sentences = data['sentences']
     print(f"Received sentences: {sentences}")
 
-    quillbot_translations = translate_to_bengali_quillbot(sentences)
-    google_translations = translate_to_bengali_google(sentences)
-
-    translations = {
-        'quillbot': quillbot_translations,
-        'google': google_translations
-    }
+    trace = start_trace()
+    start = time.monotonic()
+    # Both engines (and every browser session of each) work at the same time
+    translations = translate_sentences(sentences)
+    elapsed = time.monotonic() - start
+    request_seconds.observe(elapsed, endpoint='translate')
     print(f"Translations: {translations}")
+    if request.args.get('trace') in ('1', 'true'):
+        return jsonify(translations=translations, trace={'seconds': round(elapsed, 4), 'stages': trace})
     return jsonify(translations=translations)
 
+# Queue sentences for translation and return at once; results are read from
+# /jobs/<id> or streamed from /jobs/<id>/stream
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    data = request.get_json(silent=True) or {}
+    sentences = data.get('sentences')
+    if not isinstance(sentences, list) or not all(isinstance(sentence, str) for sentence in sentences):
+        return jsonify({'error': 'sentences must be a list of strings'}), 400
+    engines = data.get('engines') or list(ENGINES)
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        return jsonify({'error': f"Unknown engines: {', '.join(unknown)}"}), 400
+
+    job = job_scheduler.submit(sentences, engines)
+    print(f"Queued job {job.id} with {len(sentences)} sentences")
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'stream_url': url_for('stream_job', job_id=job.id),
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_scheduler.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(dict(job.summary(), translations=job.results))
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_scheduler.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.summary())
+
+def format_stream_line(message, sse):
+    data = json.dumps(message, ensure_ascii=False)
+    if sse:
+        return f"event: {message['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+# Per-sentence results as they finish: NDJSON by default, Server-Sent Events when
+# the client asks for text/event-stream. The last message has type "status".
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    job = job_scheduler.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    sse = 'text/event-stream' in request.headers.get('Accept', '')
+
+    def generate():
+        position = 0
+        while True:
+            events, finished = job.events_since(position, timeout=STREAM_KEEPALIVE)
+            position += len(events)
+            for event in events:
+                yield format_stream_line(dict(event, type='result', sentence=job.sentences[event['index']]), sse)
+            if finished:
+                yield format_stream_line(dict(job.summary(), type='status'), sse)
+                return
+            if not events:
+                # Keep proxies from closing an idle connection
+                yield ": keepalive\n\n" if sse else "\n"
+
+    mimetype = 'text/event-stream' if sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+boot_state = {'booting': False, 'finished': False, 'error': None}
+
+# Resolve the chromedriver binary and open every pool's sessions before traffic arrives
+def boot():
+    boot_state['booting'] = True
+    start = time.monotonic()
+    try:
+        get_driver_path()
+        warm_threads = [threading.Thread(target=pool.warm) for pool, _ in ENGINES.values()]
+        for thread in warm_threads:
+            thread.start()
+        for thread in warm_threads:
+            thread.join()
+    except Exception as e:
+        boot_state['error'] = str(e)
+        print(f"Boot failed: {e}")
+    finally:
+        boot_state['booting'] = False
+        boot_state['finished'] = True
+    print(f"Boot finished in {time.monotonic() - start:.1f}s")
+
+def pool_samples():
+    samples = []
+    for name, (pool, _) in ENGINES.items():
+        stats = pool.stats()
+        for state in ('idle', 'in_use', 'starting'):
+            samples.append(({'engine': name, 'state': state}, stats[state]))
+    return samples
+
+def pool_utilization_samples():
+    samples = []
+    for name, (pool, _) in ENGINES.items():
+        stats = pool.stats()
+        samples.append(({'engine': name}, stats['in_use'] / pool.size if pool.size else 0))
+    return samples
+
+def memory_lookup_samples():
+    stats = translation_memory.stats()
+    return [({'result': result}, stats[key]) for result, key in
+            (('memory_hit', 'memory_hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses'))]
+
+Gauge('translation_pool_sessions', 'Browser sessions per engine and state', pool_samples)
+Gauge('translation_pool_utilization', 'Share of each pool that is checked out', pool_utilization_samples)
+Gauge('translation_memory_lookups_total', 'Translation memory lookups by result', memory_lookup_samples, kind='counter')
+Gauge('translation_memory_hit_ratio', 'Share of translation memory lookups that were hits',
+      lambda: [({}, translation_memory.stats()['hit_rate'])])
+Gauge('translation_jobs_queued', 'Jobs waiting for a worker', lambda: [({}, job_scheduler.queued())])
+
+# Prometheus scrape endpoint
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Ready once booting is over and every engine has at least one open session
+@app.route('/ready', methods=['GET'])
+def ready():
+    engines = {name: pool.stats() for name, (pool, _) in ENGINES.items()}
+    is_ready = boot_state['finished'] and all(stats['open'] > 0 for stats in engines.values())
+    body = {
+        'ready': is_ready,
+        'booting': boot_state['booting'],
+        'error': boot_state['error'],
+        'warm_sessions': sum(stats['open'] for stats in engines.values()),
+        'engines': engines,
+    }
+    return jsonify(body), 200 if is_ready else 503
+
+def close_pools():
+    shutdown_executor()
+    quillbot_pool.close()
+    google_pool.close()
+    translation_memory.close()
+
+atexit.register(close_pools)
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Start the browsers while the server comes up; /ready reports when they're done
+    threading.Thread(target=boot, name='boot', daemon=True).start()
+    job_scheduler.start()
+    # The reloader would import the app twice and start a second set of browsers
+    app.run(debug=True, use_reloader=False, threaded=True)
@@ -0,0 +1,41 @@
+# Sentences are sent one per line; translation engines keep line breaks intact
+DELIMITER = '\n'
+
+def can_batch(sentence, max_chars):
+    return bool(sentence.strip()) and DELIMITER not in sentence and len(sentence) <= max_chars
+
+# Group consecutive sentences into batches whose joined text stays under max_chars.
+# Sentences that can't be batched (blank, multi-line, too long) get a batch of their own.
+def pack_batches(sentences, max_chars):
+    batches = []
+    current = []
+    current_chars = 0
+    for sentence in sentences:
+        if not can_batch(sentence, max_chars):
+            if current:
+                batches.append(current)
+                current, current_chars = [], 0
+            batches.append([sentence])
+            continue
+        extra = len(sentence) + (len(DELIMITER) if current else 0)
+        if current and current_chars + extra > max_chars:
+            batches.append(current)
+            current, current_chars = [], 0
+            extra = len(sentence)
+        current.append(sentence)
+        current_chars += extra
+    if current:
+        batches.append(current)
+    return batches
+
+def join_batch(batch):
+    return DELIMITER.join(sentence.strip() for sentence in batch)
+
+# Split translated batch text back into one entry per sentence, or None if the
+# line count no longer matches the input.
+def split_batch_output(text, expected):
+    lines = [line.strip() for line in text.split(DELIMITER)]
+    lines = [line for line in lines if line]
+    if len(lines) != expected:
+        return None
+    return lines
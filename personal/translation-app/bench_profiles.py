@@ -0,0 +1,83 @@
+import argparse
+import statistics
+import time
+from selenium.webdriver.common.by import By
+from driver_pool import create_driver, quit_driver, session_memory_mb
+from waits import wait_for_element
+from app import GOOGLE_URL, QUILLBOT_URL
+
+# Page to open for each engine and the element that means it is ready to use
+PAGES = {
+    'google': (GOOGLE_URL, By.CSS_SELECTOR, 'textarea[aria-label="Source text"]'),
+    'quillbot': (QUILLBOT_URL, By.ID, 'translate-input-box'),
+}
+
+# Requests the page made and bytes it transferred, from the Resource Timing API
+RESOURCE_TOTALS_JS = """
+var entries = performance.getEntriesByType('resource');
+var bytes = entries.reduce(function (sum, e) { return sum + (e.transferSize || 0); }, 0);
+var nav = performance.getEntriesByType('navigation')[0];
+return [entries.length, bytes + (nav ? nav.transferSize : 0)];
+"""
+
+# Open the engine's page in a fresh session `runs` times and measure each load
+def measure(engine, profile, runs, headless, block_stylesheets):
+    url, by, value = PAGES[engine]
+    samples = []
+    for run in range(runs):
+        driver = create_driver(headless=headless, profile=profile, block_stylesheets=block_stylesheets)
+        try:
+            start = time.monotonic()
+            driver.get(url)
+            wait_for_element(driver, by, value, step=f'{engine}_{profile}_ready')
+            ready = time.monotonic() - start
+            requests, transferred = driver.execute_script(RESOURCE_TOTALS_JS)
+            samples.append({
+                'ready': ready,
+                'memory': session_memory_mb(driver),
+                'requests': requests,
+                'kb': transferred / 1024,
+            })
+        finally:
+            quit_driver(driver)
+        print(f"  {engine}/{profile} run {run + 1}: ready in {ready * 1000:.0f} ms")
+    return samples
+
+def median(samples, key):
+    values = [sample[key] for sample in samples if sample[key] is not None]
+    return statistics.median(values) if values else None
+
+def format_value(value, unit):
+    return 'n/a' if value is None else f"{value:.0f} {unit}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare page-ready time and memory of the full and lean browser profiles")
+    parser.add_argument('--engines', nargs='+', default=list(PAGES), choices=list(PAGES))
+    parser.add_argument('--profiles', nargs='+', default=['full', 'lean'], choices=['full', 'lean'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--headless', action='store_true', help="run the full profile headless too, to compare only resource blocking")
+    parser.add_argument('--block-stylesheets', action='store_true')
+    args = parser.parse_args()
+
+    rows = []
+    for engine in args.engines:
+        for profile in args.profiles:
+            headless = True if args.headless else None
+            samples = measure(engine, profile, args.runs, headless, args.block_stylesheets)
+            rows.append((engine, profile, samples))
+
+    print()
+    print(f"{'engine':<10}{'profile':<9}{'page ready':>12}{'memory':>10}{'requests':>10}{'transfer':>11}")
+    for engine, profile, samples in rows:
+        ready = median(samples, 'ready')
+        print(
+            f"{engine:<10}{profile:<9}"
+            f"{format_value(ready * 1000, 'ms'):>12}"
+            f"{format_value(median(samples, 'memory'), 'MB'):>10}"
+            f"{median(samples, 'requests'):>10.0f}"
+            f"{format_value(median(samples, 'kb'), 'KB'):>11}"
+        )
+    print("(medians per session; memory needs psutil)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STANDINS = os.path.join(HERE, 'standins')
+
+# Serves standins/, holding each page back for page_latency seconds like a slow site would
+class StandinHandler(SimpleHTTPRequestHandler):
+    page_latency = 0.0
+
+    def do_GET(self):
+        if self.path.split('?')[0].endswith('.html'):
+            time.sleep(self.page_latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_standin_server(page_latency):
+    handler = partial(StandinHandler, directory=STANDINS)
+    StandinHandler.page_latency = page_latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def load_sentences(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+# Peak resident memory of every process below this one (chromedriver and Chrome)
+class MemorySampler:
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+
+    def sample(self):
+        total = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    def run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb or 0, self.sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+def post_translate(base_url, sentences):
+    body = json.dumps({'sentences': sentences}).encode('utf-8')
+    request = urllib.request.Request(f"{base_url}/translate", data=body, headers={'Content-Type': 'application/json'})
+    start = time.monotonic()
+    with urllib.request.urlopen(request, timeout=600) as response:
+        translations = json.loads(response.read())['translations']
+    return time.monotonic() - start, translations
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /translate against local stand-in translation pages")
+    parser.add_argument('--sentences', default=os.path.join(HERE, 'sample-text.md'), help="text file, one sentence per line")
+    parser.add_argument('--requests', type=int, default=4, help="number of /translate requests")
+    parser.add_argument('--per-request', type=int, default=10, help="sentences in each request")
+    parser.add_argument('--concurrency', type=int, default=2, help="requests in flight at once")
+    parser.add_argument('--latency', type=int, default=300, help="ms before a stand-in shows its translation")
+    parser.add_argument('--page-latency', type=int, default=200, help="ms before a stand-in page is served")
+    parser.add_argument('--pool-size', type=int, default=2, help="browser sessions per engine")
+    parser.add_argument('--cache', action='store_true', help="keep the translation memory on (off by default so every sentence hits a browser)")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    standins = start_standin_server(args.page_latency / 1000)
+    standin_url = f"http://127.0.0.1:{standins.server_port}"
+
+    # The app reads these at import time
+    os.environ['QUILLBOT_URL'] = f"{standin_url}/quillbot.html?latency={args.latency}"
+    os.environ['GOOGLE_TRANSLATE_URL'] = f"{standin_url}/google.html?sl=en&tl=bn&op=translate&latency={args.latency}"
+    os.environ['DRIVER_POOL_SIZE'] = str(args.pool_size)
+    os.environ['TRANSLATE_WORKERS'] = str(args.pool_size * 2)
+    os.environ['TM_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench_memory.sqlite3')
+    if not args.cache:
+        os.environ['TM_TTL'] = '0'
+    sys.path.insert(0, HERE)
+    import app as translation_app
+    from werkzeug.serving import make_server
+
+    print("Starting browsers...")
+    boot_start = time.monotonic()
+    translation_app.boot()
+    boot_seconds = time.monotonic() - boot_start
+
+    server = make_server('127.0.0.1', 0, translation_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    sentences = load_sentences(args.sentences)
+    batches = []
+    for i in range(args.requests):
+        start = (i * args.per_request) % len(sentences)
+        batches.append([sentences[(start + j) % len(sentences)] for j in range(args.per_request)])
+
+    print(f"Sending {args.requests} requests of {args.per_request} sentences, {args.concurrency} at a time...")
+    latencies = []
+    failures = 0
+    with MemorySampler() as memory:
+        run_start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for seconds, translations in pool.map(partial(post_translate, base_url), batches):
+                latencies.append(seconds)
+                failures += sum(text == translation_app.NOT_FOUND for texts in translations.values() for text in texts)
+        wall = time.monotonic() - run_start
+
+    total_sentences = args.requests * args.per_request
+    results = {
+        'boot_seconds': boot_seconds,
+        'wall_seconds': wall,
+        'sentences': total_sentences,
+        'sentences_per_second': total_sentences / wall,
+        'p50_seconds': statistics.median(latencies),
+        'p95_seconds': percentile(latencies, 0.95),
+        'failed_translations': failures,
+        'peak_browser_memory_mb': memory.peak_mb,
+        'settings': vars(args),
+    }
+
+    print()
+    print(f"boot:            {boot_seconds:.2f} s")
+    print(f"throughput:      {results['sentences_per_second']:.2f} sentences/s ({total_sentences} in {wall:.2f} s)")
+    print(f"request latency: p50 {results['p50_seconds']:.2f} s, p95 {results['p95_seconds']:.2f} s")
+    print(f"failed:          {failures} translations")
+    if memory.peak_mb is not None:
+        print(f"browser memory:  {memory.peak_mb:.0f} MB peak")
+    else:
+        print("browser memory:  n/a (install psutil)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    server.shutdown()
+    standins.shutdown()
+    translation_app.close_pools()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+from metrics import observe_stage
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Pool settings, overridable from the environment
+POOL_SIZE = int(os.environ.get('DRIVER_POOL_SIZE', 2))
+MAX_USES = int(os.environ.get('DRIVER_MAX_USES', 50))
+CHECKOUT_TIMEOUT = float(os.environ.get('DRIVER_CHECKOUT_TIMEOUT', 120))
+
+# JavaScript heap limit for each renderer of a lean session, in MB
+LEAN_MEMORY_MB = int(os.environ.get('LEAN_MEMORY_MB', 512))
+
+# Requests a lean session never makes: images, fonts, media and third-party trackers
+BLOCKED_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'woff', 'woff2', 'ttf', 'otf', 'mp4', 'webm', 'mp3']
+BLOCKED_DOMAINS = [
+    'google-analytics.com', 'googletagmanager.com', 'googleadservices.com', 'doubleclick.net',
+    'googlesyndication.com', 'facebook.net', 'hotjar.com', 'clarity.ms', 'segment.io',
+    'amplitude.com', 'intercom.io', 'sentry.io', 'fonts.googleapis.com', 'fonts.gstatic.com',
+]
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+# Resolve (and download if needed) the chromedriver binary only once per process
+def get_driver_path():
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+def blocked_url_patterns(block_stylesheets=False):
+    extensions = BLOCKED_EXTENSIONS + (['css'] if block_stylesheets else [])
+    patterns = []
+    for extension in extensions:
+        patterns += [f'*.{extension}', f'*.{extension}?*']
+    patterns += [f'*://*.{domain}/*' for domain in BLOCKED_DOMAINS]
+    patterns += [f'*://{domain}/*' for domain in BLOCKED_DOMAINS]
+    return patterns
+
+# Block resources through the DevTools protocol; applies to every page the session opens
+def block_resources(driver, block_stylesheets=False):
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_url_patterns(block_stylesheets)})
+
+# profile is 'full' (a normal browser) or 'lean' (headless unless told otherwise,
+# no images, fonts, media or trackers, and a capped JavaScript heap)
+def create_driver(headless=None, profile='full', block_stylesheets=False):
+    lean = profile == 'lean'
+    if headless is None:
+        headless = lean
+    options = webdriver.ChromeOptions()
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    if headless:
+        options.add_argument('--headless=new')
+    if lean:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_argument(f'--js-flags=--max-old-space-size={LEAN_MEMORY_MB}')
+        options.add_argument('--renderer-process-limit=2')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-background-networking')
+        options.add_argument('--disable-component-update')
+        options.add_argument('--disable-default-apps')
+        options.add_argument('--disable-sync')
+        options.add_argument('--mute-audio')
+        options.add_argument('--disk-cache-size=33554432')
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2,
+        })
+    driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+    if lean:
+        try:
+            block_resources(driver, block_stylesheets)
+        except Exception:
+            quit_driver(driver)
+            raise
+    return driver
+
+# Resident memory of the browser behind a driver (chromedriver and every Chrome
+# process it started), in MB; None when psutil isn't installed
+def session_memory_mb(driver):
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        processes = [root] + root.children(recursive=True)
+    except (psutil.Error, AttributeError):
+        return None
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+def is_healthy(driver):
+    try:
+        return driver.execute_script('return 1') == 1
+    except Exception:
+        return False
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Error quitting driver: {e}")
+
+# A fixed-size pool of long-lived Chrome sessions.
+# Drivers are checked out for one request and checked back in afterwards;
+# a driver is recycled after max_uses check-ins or when it stops responding.
+# setup(driver), if given, runs on every new session before it is handed out,
+# e.g. to open the engine's page and choose the target language.
+# profile and headless are passed to create_driver.
+class DriverPool:
+    def __init__(self, name, size=POOL_SIZE, max_uses=MAX_USES, headless=None, setup=None, profile='full', block_stylesheets=False):
+        self.name = name
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.setup = setup
+        self.profile = profile
+        self.block_stylesheets = block_stylesheets
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._created = 0
+        self._starting = 0
+        self._lock = threading.Lock()
+        # Signalled whenever a session is returned or a slot frees up, so waiting
+        # callers take the session or start a replacement for the one that was dropped
+        self._available = threading.Condition(self._lock)
+
+    def _new_driver(self):
+        with self._lock:
+            self._starting += 1
+        try:
+            start = time.monotonic()
+            driver = create_driver(headless=self.headless, profile=self.profile, block_stylesheets=self.block_stylesheets)
+            observe_stage(self.name, 'launch', time.monotonic() - start)
+            if self.setup is not None:
+                start = time.monotonic()
+                try:
+                    self.setup(driver)
+                except Exception:
+                    quit_driver(driver)
+                    raise
+                observe_stage(self.name, 'setup', time.monotonic() - start)
+        finally:
+            with self._lock:
+                self._starting -= 1
+        self._uses[id(driver)] = 0
+        print(f"[{self.name}] Started {self.profile} browser session ({self._created}/{self.size})")
+        return driver
+
+    def _release(self, driver):
+        with self._available:
+            self._idle.put(driver)
+            self._available.notify()
+
+    # Gives back a slot reserved for a session that was never handed out or is gone
+    def _free_slot(self):
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def _discard(self, driver):
+        self._uses.pop(id(driver), None)
+        quit_driver(driver)
+        self._free_slot()
+
+    # Start browsers in parallel until the pool is full; returns how many are open
+    def warm(self):
+        with self._lock:
+            missing = self.size - self._created
+            self._created += missing
+
+        def start_one():
+            try:
+                self._release(self._new_driver())
+            except Exception as e:
+                self._free_slot()
+                print(f"[{self.name}] Error starting browser: {e}")
+
+        threads = [threading.Thread(target=start_one) for _ in range(missing)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.stats()['open']
+
+    def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            # Take an idle session, or reserve a slot and start one; otherwise wait
+            # until a session is checked in or a recycled one frees its slot
+            with self._available:
+                while True:
+                    try:
+                        driver = self._idle.get_nowait()
+                        break
+                    except queue.Empty:
+                        pass
+                    if self._created < self.size:
+                        self._created += 1
+                        driver = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No {self.name} browser available after {timeout}s")
+                    self._available.wait(remaining)
+
+            if driver is None:
+                try:
+                    return self._new_driver()
+                except Exception:
+                    self._free_slot()
+                    raise
+
+            if is_healthy(driver):
+                return driver
+            print(f"[{self.name}] Discarding unresponsive browser")
+            self._discard(driver)
+
+    def checkin(self, driver, broken=False):
+        uses = self._uses.get(id(driver), 0) + 1
+        self._uses[id(driver)] = uses
+        if broken or uses >= self.max_uses or not is_healthy(driver):
+            print(f"[{self.name}] Recycling browser after {uses} uses")
+            self._discard(driver)
+            return
+        self._release(driver)
+
+    @contextmanager
+    def driver(self):
+        driver = self.checkout()
+        broken = False
+        try:
+            yield driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.checkin(driver, broken=broken)
+
+    # open counts sessions that are ready (idle or checked out), not ones still starting
+    def stats(self):
+        with self._lock:
+            open_sessions = self._created - self._starting
+            starting = self._starting
+        idle = self._idle.qsize()
+        return {'size': self.size, 'open': open_sessions, 'starting': starting, 'idle': idle, 'in_use': open_sessions - idle}
+
+    def close(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
@@ -0,0 +1,117 @@
+import contextvars
+import os
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from metrics import failures, observe_stage
+from translation_memory import normalize_sentence
+
+# Upper bound on browser work running at once across all engines
+MAX_WORKERS = int(os.environ.get('TRANSLATE_WORKERS', 4))
+
+NOT_FOUND = "Translation not found"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='translate')
+
+# Split items into at most `count` contiguous (start, chunk) pieces of similar size
+def split_into_chunks(items, count):
+    count = max(1, min(count, len(items)))
+    size, extra = divmod(len(items), count)
+    chunks = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        if end > start:
+            chunks.append((start, items[start:end]))
+        start = end
+    return chunks
+
+# Translate one chunk on a borrowed browser, reporting each sentence as it finishes.
+# Stops early (returning what it has) once cancel is set.
+def _run_chunk(pool, translate_with_driver, sentences, on_translated=None, cancel=None):
+    results = []
+    if cancel is not None and cancel.is_set():
+        return results
+    start = time.monotonic()
+    with pool.driver() as driver:
+        observe_stage(pool.name, 'checkout', time.monotonic() - start)
+        translations = translate_with_driver(driver, sentences)
+        try:
+            for sentence in sentences:
+                if cancel is not None and cancel.is_set():
+                    break
+                translated_text = next(translations, NOT_FOUND)
+                results.append(translated_text)
+                if on_translated is not None:
+                    on_translated(sentence, translated_text)
+        finally:
+            translations.close()
+    return results
+
+# Translate sentences with every engine at once.
+# engines maps a name to (pool, translate_with_driver). Duplicate sentences are sent
+# once, sentences found in the translation memory are not sent at all, and the rest
+# are split across each engine's browser sessions. All chunks run on the shared worker
+# pool and the results are put back in input order.
+# on_result(engine, index, translation) is called for every input sentence as soon as
+# its translation is known; setting the cancel event stops work between sentences.
+def translate_all(engines, sentences, memory=None, source_lang='en', target_lang='bn', on_result=None, cancel=None):
+    normalized = [normalize_sentence(sentence) for sentence in sentences]
+    unique = list(dict.fromkeys(normalized))
+    positions = {}
+    for index, sentence in enumerate(normalized):
+        positions.setdefault(sentence, []).append(index)
+
+    def report(name, sentence, translated_text):
+        translated[name][sentence] = translated_text
+        if translated_text == NOT_FOUND:
+            failures.inc(engine=name, stage='sentence')
+        if on_result is not None:
+            for index in positions[sentence]:
+                on_result(name, index, translated_text)
+
+    translated = {}
+    futures = []
+    for name, (pool, translate_with_driver) in engines.items():
+        translated[name] = {}
+        cached = memory.get_many(name, source_lang, target_lang, unique) if memory else {}
+        for sentence, translated_text in cached.items():
+            report(name, sentence, translated_text)
+        pending = [sentence for sentence in unique if sentence not in translated[name]]
+        if pending:
+            print(f"[{name}] {len(unique) - len(pending)} of {len(unique)} sentences from translation memory")
+        for _, chunk in split_into_chunks(pending, pool.size):
+            on_translated = lambda sentence, translated_text, name=name: report(name, sentence, translated_text)
+            # Run in a copy of this context so stage timings reach the caller's trace
+            context = contextvars.copy_context()
+            future = _executor.submit(context.run, _run_chunk, pool, translate_with_driver, chunk, on_translated, cancel)
+            futures.append((name, chunk, future))
+
+    new_translations = {name: {} for name in engines}
+    for name, chunk, future in futures:
+        try:
+            results = future.result()
+        except CancelledError:
+            continue
+        except Exception as e:
+            print(f"[{name}] Error translating {len(chunk)} sentences: {e}")
+            failures.inc(engine=name, stage='chunk')
+            # Still answer every sentence so streamed jobs see each one finish
+            for sentence in chunk:
+                if sentence not in translated[name]:
+                    report(name, sentence, NOT_FOUND)
+            continue
+        for sentence, translated_text in zip(chunk, results):
+            if translated_text and translated_text != NOT_FOUND:
+                new_translations[name][sentence] = translated_text
+
+    if memory:
+        for name, pairs in new_translations.items():
+            memory.put_many(name, source_lang, target_lang, pairs)
+
+    return {
+        name: [translated[name].get(sentence, NOT_FOUND) for sentence in normalized]
+        for name in engines
+    }
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,39 +1,35 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import time
+from driver_pool import DriverPool
+from waits import wait_for_element, wait_for_new_text
+import atexit
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS
 
+driver_pool = DriverPool('google', headless=True)
+atexit.register(driver_pool.close)
+
 def translate_to_bengali(sentences):
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    
+    with driver_pool.driver() as driver:
+        return translate_with_driver(driver, sentences)
+
+def translate_with_driver(driver, sentences):
     translations = []
     for sentence in sentences:
         driver.get("https://translate.google.com/?sl=en&tl=bn&op=translate")
-        time.sleep(2)
-        input_box = driver.find_element(By.CSS_SELECTOR, 'textarea[aria-label="Source text"]')
+        input_box = wait_for_element(driver, By.CSS_SELECTOR, 'textarea[aria-label="Source text"]', step='google_input')
         input_box.clear()
         input_box.send_keys(sentence)
-        time.sleep(2)
         try:
-            translated_text = driver.find_element(By.CSS_SELECTOR, 'span[jsname="W297wb"]').text
-        except:
+            translated_text = wait_for_new_text(driver, 'span[jsname="W297wb"]', step='google_output')
+        except TimeoutException:
             translated_text = "Translation not found"
         translations.append(translated_text)
         print(f"Translated: '{sentence}' to '{translated_text}'")
-        time.sleep(2)
 
-    driver.quit()
     return translations
 
 @app.route('/translate', methods=['POST'])
@@ -46,4 +42,5 @@ def translate():
     return jsonify(translations=translations)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    driver_pool.warm()
+    app.run(debug=True, use_reloader=False, threaded=True)
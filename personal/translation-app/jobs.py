@@ -0,0 +1,140 @@
+import os
+import queue
+import threading
+import time
+import uuid
+
+# How many jobs are translated at the same time, and how long finished jobs are kept
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+JOB_TTL = float(os.environ.get('JOB_TTL', 3600))
+
+FINISHED = ('done', 'failed', 'cancelled')
+
+# One submitted batch of sentences. Results arrive from worker threads as events
+# that any number of readers can follow with events_since().
+class Job:
+    def __init__(self, sentences, engines):
+        self.id = uuid.uuid4().hex
+        self.sentences = sentences
+        self.engines = list(engines)
+        self.status = 'queued'
+        self.error = None
+        self.results = {engine: [None] * len(sentences) for engine in self.engines}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._events = []
+        self._changed = threading.Condition()
+
+    def add_result(self, engine, index, translation):
+        with self._changed:
+            self.results[engine][index] = translation
+            self._events.append({'engine': engine, 'index': index, 'translation': translation})
+            self._changed.notify_all()
+
+    def set_status(self, status, error=None):
+        with self._changed:
+            self.status = status
+            self.error = error
+            if status == 'running':
+                self.started_at = time.time()
+            if status in FINISHED:
+                self.finished_at = time.time()
+            self._changed.notify_all()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+    # Events after position `start`, waiting up to timeout for new ones.
+    # Returns (events, finished); finished is only True once every event was returned.
+    def events_since(self, start, timeout=None):
+        with self._changed:
+            if start >= len(self._events) and not self.finished:
+                self._changed.wait(timeout)
+            events = self._events[start:]
+            return events, self.finished and start + len(events) >= len(self._events)
+
+    def summary(self):
+        with self._changed:
+            completed = {
+                engine: sum(result is not None for result in results)
+                for engine, results in self.results.items()
+            }
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'error': self.error,
+                'total': len(self.sentences),
+                'completed': completed,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+# Runs submitted jobs on background threads, one job per worker at a time.
+# run_job(job) does the work and reports results through job.add_result.
+class JobScheduler:
+    def __init__(self, run_job, workers=JOB_WORKERS, ttl=JOB_TTL):
+        self.run_job = run_job
+        self.workers = workers
+        self.ttl = ttl
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._start_lock:
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    # Workers start with the first job, however the app was launched
+    def submit(self, sentences, engines):
+        self.start()
+        job = Job(sentences, engines)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.status == 'queued':
+            job.set_status('cancelled')
+        return job
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job.cancel_event.is_set():
+                continue
+            job.set_status('running')
+            try:
+                self.run_job(job)
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                job.set_status('failed', str(e))
+                continue
+            job.set_status('cancelled' if job.cancel_event.is_set() else 'done')
@@ -0,0 +1,144 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from a quick DOM poll up to a slow page load
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple((name, labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [f'{self.name}{_format_labels(key)} {_format_number(value)}' for key, value in values.items()]
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total) in values.items():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", _format_number(bound)),))} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_number(total)}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {counts[-1]}')
+        return lines
+
+# A value read at scrape time: collect() returns [(labels dict, value), ...].
+# kind='counter' is for totals kept elsewhere, e.g. the translation memory's counts.
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, collect, kind='gauge'):
+        super().__init__(name, help_text)
+        self.collect = collect
+        self.kind = kind
+
+    def render(self):
+        try:
+            samples = self.collect()
+        except Exception as e:
+            print(f"Error collecting {self.name}: {e}")
+            return []
+        return self.header() + [
+            f'{self.name}{_format_labels(sorted(labels.items()))} {_format_number(value)}'
+            for labels, value in samples
+        ]
+
+# Everything registered so far, in the Prometheus text exposition format
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+stage_seconds = Histogram(
+    'translation_stage_seconds', 'Time spent in each stage of translating on a browser', ['engine', 'stage'])
+wait_seconds = Histogram(
+    'translation_wait_seconds', 'Time spent waiting for the page, per wait step', ['step', 'outcome'])
+wait_retries = Counter(
+    'translation_wait_retries_total', 'Polls that found the page not ready yet', ['step'])
+failures = Counter(
+    'translation_failures_total', 'Sentences or chunks that could not be translated', ['engine', 'stage'])
+request_seconds = Histogram(
+    'translation_request_seconds', 'Time to answer a translation request', ['endpoint'])
+
+# Per-request trace: a list of stage timings shared with the worker threads the
+# request's work runs on (see executor, which copies the context into each task)
+_trace = contextvars.ContextVar('translation_trace', default=None)
+
+def start_trace():
+    trace = []
+    _trace.set(trace)
+    return trace
+
+def add_to_trace(engine, stage, seconds):
+    trace = _trace.get()
+    if trace is not None:
+        trace.append({'engine': engine, 'stage': stage, 'seconds': round(seconds, 4), 'thread': threading.current_thread().name})
+
+def observe_stage(engine, stage, seconds):
+    stage_seconds.observe(seconds, engine=engine, stage=stage)
+    add_to_trace(engine, stage, seconds)
+
+@contextmanager
+def timed(engine, stage):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(engine, stage, time.monotonic() - start)
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Where translations are stored and how long / how many of them are kept
+TM_PATH = os.environ.get('TM_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_memory.sqlite3'))
+TM_TTL = float(os.environ.get('TM_TTL', 30 * 24 * 3600))
+TM_MAX_ENTRIES = int(os.environ.get('TM_MAX_ENTRIES', 100000))
+TM_MEMORY_ENTRIES = int(os.environ.get('TM_MEMORY_ENTRIES', 5000))
+
+# Sentences that differ only in whitespace or unicode form share one entry
+def normalize_sentence(sentence):
+    return unicodedata.normalize('NFC', ' '.join(sentence.split()))
+
+# Two-tier cache of finished translations: an in-memory LRU in front of SQLite.
+# Entries are keyed on (engine, source language, target language, normalized sentence).
+class TranslationMemory:
+    def __init__(self, path=TM_PATH, ttl=TM_TTL, max_entries=TM_MAX_ENTRIES, memory_entries=TM_MEMORY_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS translations (
+                engine TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                sentence TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL,
+                PRIMARY KEY (engine, source_lang, target_lang, sentence)
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS translations_used_at ON translations (used_at)')
+        self._db.commit()
+
+    def _remember(self, key, translation, created_at):
+        self._memory[key] = (translation, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # Look up normalized sentences; returns {sentence: translation} for the hits only
+    def get_many(self, engine, source_lang, target_lang, sentences):
+        now = time.time()
+        found = {}
+        with self._lock:
+            missing = []
+            for sentence in sentences:
+                key = (engine, source_lang, target_lang, sentence)
+                entry = self._memory.get(key)
+                if entry is not None and now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    found[sentence] = entry[0]
+                    self._counts['memory_hits'] += 1
+                else:
+                    self._memory.pop(key, None)
+                    missing.append(sentence)
+
+            used = []
+            for sentence in missing:
+                row = self._db.execute(
+                    'SELECT translation, created_at FROM translations '
+                    'WHERE engine = ? AND source_lang = ? AND target_lang = ? AND sentence = ? AND created_at > ?',
+                    (engine, source_lang, target_lang, sentence, now - self.ttl),
+                ).fetchone()
+                if row is None:
+                    self._counts['misses'] += 1
+                    continue
+                found[sentence] = row[0]
+                self._remember((engine, source_lang, target_lang, sentence), row[0], row[1])
+                used.append((now, engine, source_lang, target_lang, sentence))
+                self._counts['disk_hits'] += 1
+
+            if used:
+                self._db.executemany(
+                    'UPDATE translations SET used_at = ? '
+                    'WHERE engine = ? AND source_lang = ? AND target_lang = ? AND sentence = ?',
+                    used,
+                )
+                self._db.commit()
+        return found
+
+    # Store {sentence: translation} pairs, then drop expired and least recently used rows
+    def put_many(self, engine, source_lang, target_lang, translations):
+        if not translations:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(engine, source_lang, target_lang, sentence, translation, now, now)
+                 for sentence, translation in translations.items()],
+            )
+            for sentence, translation in translations.items():
+                self._remember((engine, source_lang, target_lang, sentence), translation, now)
+            self._counts['stores'] += len(translations)
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        evicted = self._db.execute('DELETE FROM translations WHERE created_at <= ?', (now - self.ttl,)).rowcount
+        total = self._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+        if total > self.max_entries:
+            evicted += self._db.execute(
+                'DELETE FROM translations WHERE rowid IN '
+                '(SELECT rowid FROM translations ORDER BY used_at LIMIT ?)',
+                (total - self.max_entries,),
+            ).rowcount
+        self._counts['evictions'] += evicted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_entries'] = self._db.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
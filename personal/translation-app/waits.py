@@ -0,0 +1,136 @@
+import os
+import time
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from metrics import add_to_trace, wait_retries, wait_seconds
+
+# Longest time any single step (page element, translation output) may take
+STEP_TIMEOUT = float(os.environ.get('WAIT_STEP_TIMEOUT', 15))
+# Output text has to stay unchanged this long before it counts as finished
+STABLE_MS = int(os.environ.get('WAIT_STABLE_MS', 300))
+# Polling backoff: first delay, growth factor and ceiling, in seconds
+POLL_INITIAL = 0.05
+POLL_FACTOR = 2
+POLL_MAX = 1.0
+
+# Every wait is recorded in the translation_wait_seconds histogram and the request trace
+def record_wait(step, seconds, timed_out=False):
+    wait_seconds.observe(seconds, step=step, outcome='timeout' if timed_out else 'ok')
+    add_to_trace(None, f'wait:{step}', seconds)
+
+# Call condition() until it returns something truthy, sleeping with exponential backoff
+def poll_until(condition, step, timeout=STEP_TIMEOUT):
+    start = time.monotonic()
+    delay = POLL_INITIAL
+    last_error = None
+    while True:
+        try:
+            result = condition()
+        except WebDriverException as e:
+            result = None
+            last_error = e
+        elapsed = time.monotonic() - start
+        if result:
+            record_wait(step, elapsed)
+            return result
+        if elapsed >= timeout:
+            record_wait(step, elapsed, timed_out=True)
+            message = f"{step} not ready after {timeout}s"
+            if last_error is not None:
+                message += f" (last error: {last_error.msg})"
+            raise TimeoutException(message)
+        wait_retries.inc(step=step)
+        time.sleep(min(delay, timeout - elapsed))
+        delay = min(delay * POLL_FACTOR, POLL_MAX)
+
+def wait_for_element(driver, by, value, step=None, timeout=STEP_TIMEOUT, clickable=False):
+    def find():
+        element = driver.find_element(by, value)
+        if clickable and not (element.is_displayed() and element.is_enabled()):
+            return None
+        return element
+    return poll_until(find, step or value, timeout)
+
+# With joined set, returns the text of the smallest element containing every match,
+# so output split over several spans keeps its line breaks.
+_READ_TEXT_JS = """
+function readText(selector, joined) {
+    if (!joined) {
+        var el = document.querySelector(selector);
+        return el ? el.innerText.trim() : '';
+    }
+    var matches = Array.prototype.slice.call(document.querySelectorAll(selector));
+    if (!matches.length) return '';
+    var container = matches[0];
+    while (!matches.every(function (m) { return container.contains(m); })) {
+        container = container.parentElement;
+    }
+    return container.innerText.trim();
+}
+"""
+
+def current_text(driver, css_selector, joined=False):
+    return driver.execute_script(_READ_TEXT_JS + 'return readText(arguments[0], arguments[1]);', css_selector, joined)
+
+# Resolves once the text under the selector differs from `previous` and has not
+# changed for stableMs, or with null after timeoutMs.
+_WAIT_FOR_TEXT_JS = _READ_TEXT_JS + """
+var selector = arguments[0], previous = arguments[1];
+var stableMs = arguments[2], timeoutMs = arguments[3], joined = arguments[4];
+var done = arguments[arguments.length - 1];
+var last = null, timer = null, finished = false;
+function finish(value) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(value);
+}
+function check() {
+    var text = readText(selector, joined);
+    if (text === last) return;
+    last = text;
+    clearTimeout(timer);
+    if (text && text !== previous) {
+        timer = setTimeout(function () { finish(text); }, stableMs);
+    }
+}
+var observer = new MutationObserver(check);
+observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+setTimeout(function () { finish(null); }, timeoutMs);
+check();
+"""
+
+# Wait until the element matching css_selector shows new text that has settled.
+# Uses a MutationObserver in the page; falls back to polling if scripts fail.
+def wait_for_new_text(driver, css_selector, previous='', step=None, timeout=STEP_TIMEOUT, stable_ms=STABLE_MS, joined=False):
+    step = step or css_selector
+    start = time.monotonic()
+    try:
+        driver.set_script_timeout(timeout + 5)
+        text = driver.execute_async_script(_WAIT_FOR_TEXT_JS, css_selector, previous, stable_ms, int(timeout * 1000), joined)
+    except TimeoutException:
+        text = None
+    except WebDriverException as e:
+        print(f"Mutation wait failed for {step}, polling instead: {e.msg}")
+        return _poll_for_new_text(driver, css_selector, previous, step, timeout - (time.monotonic() - start), stable_ms, joined)
+    elapsed = time.monotonic() - start
+    if text is None:
+        record_wait(step, elapsed, timed_out=True)
+        raise TimeoutException(f"{step} did not change within {timeout}s")
+    record_wait(step, elapsed)
+    return text
+
+def _poll_for_new_text(driver, css_selector, previous, step, timeout, stable_ms, joined):
+    seen = {'text': None, 'since': 0.0}
+
+    def settled():
+        text = current_text(driver, css_selector, joined)
+        now = time.monotonic()
+        if text != seen['text']:
+            seen['text'] = text
+            seen['since'] = now
+            return None
+        if text and text != previous and now - seen['since'] >= stable_ms / 1000:
+            return text
+        return None
+    return poll_until(settled, step, max(timeout, 0))